@@ -6,6 +6,7 @@ https://gadm.org/download_country_v3.html#google_vignette
 from __future__ import annotations
 
 from pathlib import Path
+from collections import deque
 from typing import Any, Dict, List, Optional, Tuple
 import json
 import csv
@@ -27,6 +28,8 @@ SHP_LEVEL_2 = Path("./data/gadm36_LTU_shp/gadm36_LTU_2.shp")
 
 DOMAIN_LETTERS = "RGBY"  # pabandyk "RGB", jei nori 3 spalvų
 
+REPORT_CHROMATIC = False  # True -> prieš sprendimą apskaičiuok chromatinį skaičių (papildoma paieška)
+
 TRACE_JSON = Path("trace.json")
 TRACE_CSV = Path("trace.csv")
 
@@ -140,28 +143,50 @@ def solve_map_coloring(
     domain_letters: str,
     max_steps: int = 50_000,
     log_events: Optional[set[str]] = None,
+    warm_start: bool = False,
+    trace_mode: str = "full",
+    ring_size: Optional[int] = None,
+    trace_path: Optional[Path] = None,
 ) -> Tuple[Optional[Dict[str, str]], List[Dict[str, Any]]]:
     # [05.1] Sukuriamas CSP objektas iš regionų kaimynystės ir spalvų domeno
     regions_csp = csp.MapColoringCSP(list(domain_letters), neighbor_dict)
 
-    # [05.2] Trace (step-by-step įrašai vizualizacijai)
-    trace: List[Dict[str, Any]] = []
-
-    # [#1] Backtracking (DFS) su heuristikomis
-    solution = csp.backtracking_search(
-        regions_csp,
-        select_unassigned_variable=csp.mrv,          # MINIMUM REMAINING VALUE (mažiausiai likusių spalvų)
-        order_domain_values=csp.lcv,                 # LEAST CONSTRAINING VALUE (mažiausiai "užspaudžia" kaimynus)
-        inference=csp.forward_checking,              # Paprastas inference (be AC3/mac)
-        trace=trace,
-        max_steps=max_steps,
-    )
+    # [05.2] Trace (step-by-step įrašai vizualizacijai); ring_size -> tik paskutiniai N įvykių
+    trace = [] if ring_size is None else deque(maxlen=ring_size)
 
-    # Jei tavo csp.py neturi 'log_events', filtruojam čia (paprastas variantas)
-    if log_events is not None:
-        trace = [t for t in trace if t.get("event") in log_events]
+    # [05.3] trace_path (.jsonl / .csv, + .gz; .bin -> csp.BinaryTrace) -> įvykiai rašomi į failą paieškos metu,
+    #        grąžinamas tuščias trace
+    if trace_path is not None:
+        if trace_path.suffix == ".bin":
+            trace = csp.BinaryTraceSink(trace_path, regions_csp)
+        else:
+            sink_class = csp.CsvTraceSink if ".csv" in trace_path.suffixes else csp.JsonlTraceSink
+            trace = sink_class(trace_path)
 
-    return solution, trace
+    try:
+        # [05.0] Godus DSatur: jei užtenka domain_letters spalvų — backtracking nereikalingas
+        #        (trace tuščias, trace_path failas sukuriamas be įvykių)
+        if warm_start:
+            greedy = csp.dsatur_coloring(neighbor_dict)
+            if max(greedy.values(), default=-1) < len(domain_letters):
+                return {region: domain_letters[c] for region, c in greedy.items()}, []
+
+        # [#1] Backtracking (DFS) su heuristikomis
+        solution = csp.backtracking_search(
+            regions_csp,
+            select_unassigned_variable=csp.mrv,      # MINIMUM REMAINING VALUE (mažiausiai likusių spalvų)
+            order_domain_values=csp.lcv,             # LEAST CONSTRAINING VALUE (mažiausiai "užspaudžia" kaimynus)
+            inference=csp.forward_checking,          # Paprastas inference (be AC3/mac)
+            trace=trace,
+            max_steps=max_steps,
+            log_events=log_events,                   # filtras taikomas pačioje paieškoje
+            trace_mode=trace_mode,                   # "delta" -> be assignment kopijų (csp.replay_trace atkuria)
+        )
+    finally:
+        if trace_path is not None:
+            trace.close()
+
+    return solution, [] if trace_path is not None else list(trace)
 
 
 def save_trace(trace: List[Dict[str, Any]], json_path: Path, csv_path: Path) -> None:
@@ -244,6 +269,13 @@ def main() -> None:
     print("[Adjacency dict]")
     print(neighbor_dict)
 
+    # [07.3b] Kiek spalvų iš tikro reikia (ribos spausdinamos, kol susitinka) — tik jei įjungta
+    if REPORT_CHROMATIC:
+        chromatic, _ = csp.chromatic_number(
+            neighbor_dict, on_bounds=lambda lo, hi: print(f"[Chromatic bounds] {lo}..{hi}")
+        )
+        print(f"[Chromatic number] {chromatic} (DOMAIN_LETTERS={DOMAIN_LETTERS!r})")
+
     # [07.4] Spręsk CSP + trace
     solution, trace = solve_map_coloring(
         neighbor_dict,
@@ -1,10 +1,29 @@
-# csp.py (minimal) — only what you need for Map Coloring (CSP + Backtracking)
+# csp.py — CSP for Map Coloring: domain representations (list / bitset / compiled int),
+# backtracking search (inference, heuristics, backjumping, nogoods, restarts, tracing),
+# local search, decomposition / tree solvers, portfolio runs and chromatic number search
 
 from __future__ import annotations
 
+import copy
+import csv
+import gzip
+import heapq
+import json
+import mmap
+import multiprocessing
+import os
+import queue as queue_module
 import random
-from collections import defaultdict
-from typing import Any, Callable, Dict, List, Optional, Tuple
+import struct
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict, deque
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, permutations
+from math import perm
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 # APRIBOJIMAS colorA != colorB
 ConstraintFn = Callable[[str, Any, str, Any], bool]
 
@@ -21,8 +40,8 @@ def count_true(items):
     return sum(1 for x in items if x)
 
 
-def argmin_random_tie(seq, key):
-    """Atsitiktinis tie-break, kai keli elementai turi tą patį minimumą."""
+def argmin_random_tie(seq, key, rng=random):
+    """Atsitiktinis tie-break, kai keli elementai turi tą patį minimumą (rng — pvz. random.Random(seed))."""
     best = None
     best_key = None
     for x in seq:
@@ -31,7 +50,7 @@ def argmin_random_tie(seq, key):
             best, best_key = [x], k
         elif k == best_key:
             best.append(x)
-    return random.choice(best)
+    return rng.choice(best)
 
 
 # -----------------------------
@@ -46,27 +65,96 @@ class CSP:
         domains: Dict[str, List[Any]],
         neighbors: Dict[str, List[str]],
         constraints: ConstraintFn,
+        different_values: Optional[bool] = None,
     ):
+        if any(v not in neighbors for v in variables):
+            # regionas be kaimynų -> tuščias sąrašas, kad neighbors[var] visada veiktų
+            neighbors = {**neighbors, **{v: [] for v in variables if v not in neighbors}}
+        # color_counts skaičiuoja per atvirkštinę kryptį -> kaimynystė turi būti simetriška (trūkstamos briaunos pridedamos)
+        reverse = list(dict.fromkeys((n, v) for v in neighbors for n in neighbors[v] if v not in neighbors.get(n, ())))
+        if reverse:
+            neighbors = {v: list(ns) for v, ns in neighbors.items()}
+            for n, v in reverse:
+                neighbors.setdefault(n, []).append(v)
+
         self.variables = variables              # REGIONAI
         self.domains = domains                  # GALIMOS SPALVOS
         self.neighbors = neighbors              # KAIMYNYSTĖS GRAFAS
         self.constraints = constraints          # APRIBOJIMAI (kaimynai negali turėti tos pačios spalvos)
+        # True -> apribojimas yra "kaimynų spalvos skiriasi": naudojam greitus branduolius be constraints() kvietimų
+        if different_values is None:
+            different_values = constraints is different_values_constraint
+        self.different_values = different_values
 
         self.curr_domains: Optional[Dict[str, List[Any]]] = None  # naudojama (paieskos busena - sprendimu priemimui, atimti spalvas leistinos reiksmes) cia saugomos spalvos visiems aplinkiniams regionams inference (forward checking)
         self.nassigns = 0
+        self.nrevisions = 0                     # kiek lankų AC3/MAC revizavo (kai kas nors išmesta)
+
+        # color_counts[var][spalva] = kiek priskirtų var kaimynų turi šitą spalvą.
+        # Galioja tik priskyrimui self.counted (atnaujinama assign/unassign metu).
+        self.color_counts: Any = None
+        self.counted: Optional[Dict[str, Any]] = None
+
+        self.rng: Any = random                  # tie-break šaltinis; random.Random(seed) -> atkartojami paleidimai
+        self.var_order: Optional[MRVBuckets] = None  # mrv_bucketed struktūra (atnaujinama prune/restore)
+        # dom/wdeg: weights[A][B] = apribojimo A-B svoris (nėra -> 1); didinamas, kai per jį ištuštėja domenas.
+        # Neišvalomas tarp paieškų / restart'ų — sukaupta informacija išlieka.
+        self.weights: Dict[Any, Dict[Any, int]] = {}
 
     def assign(self, var: str, val: Any, assignment: Dict[str, Any]) -> None:
+        if self.var_order is not None and assignment is self.var_order.assignment:
+            self.var_order.discard(var)
+        if assignment is self.counted:
+            if var in assignment:
+                self._count_neighbors(var, assignment[var], -1)
+            self._count_neighbors(var, val, +1)
         assignment[var] = val
         self.nassigns += 1
 
     def unassign(self, var: str, assignment: Dict[str, Any]) -> None:
         if var in assignment:
+            if assignment is self.counted:
+                self._count_neighbors(var, assignment[var], -1)
             del assignment[var]
+            if self.var_order is not None and assignment is self.var_order.assignment:
+                self.var_order.add(var)
+
+    def track_conflicts(self, assignment: Optional[Dict[str, Any]]) -> None:
+        """
+        Pradedam skaičiuoti kaimynų spalvas šitam priskyrimui (None -> išjungiam).
+        Tada nconflicts (o per jį num_legal_values ir lcv) = lentelės peržiūra.
+        Tik different_values apribojimui.
+        """
+        self.counted = None
+        self.color_counts = None
+        if assignment is None or not self.different_values:
+            return
+        self.color_counts = self._new_color_counts()
+        self.counted = assignment
+        for var, val in list(assignment.items()):
+            self._count_neighbors(var, val, +1)
+
+    def _new_color_counts(self) -> Any:
+        return {v: defaultdict(int) for v in self.variables}
+
+    def _count_neighbors(self, var: str, val: Any, delta: int) -> None:
+        counts = self.color_counts
+        for n in self.neighbors[var]:
+            counts[n][val] += delta
+
+    def used_colors(self, var: str) -> int:
+        """Kiek skirtingų spalvų turi priskirti var kaimynai (pagal color_counts)."""
+        return count_true(c > 0 for c in self.color_counts[var].values())
 
     def nconflicts(self, var: str, val: Any, assignment: Dict[str, Any]) -> int:
         """Kiek konfliktų turi var=val su jau nuspalvintais kaimynais."""
+        if self.different_values:
+            if assignment is self.counted:
+                return self.color_counts[var][val]
+            # konfliktas = kaimynas jau turi tą pačią spalvą
+            return count_true(n in assignment and assignment[n] == val for n in self.neighbors[var])
         conflicts = 0
-        for n in self.neighbors.get(var, []):
+        for n in self.neighbors[var]:
             if n in assignment and not self.constraints(var, val, n, assignment[n]):
                 conflicts += 1
         return conflicts
@@ -77,15 +165,20 @@ class CSP:
         if self.curr_domains is None:
             self.curr_domains = {v: list(self.domains[v]) for v in self.variables}
 
-    def suppose(self, var: str, value: Any) -> List[Tuple[str, Any]]:
+    def suppose(self, var: str, value: Any, removals: Optional[List[Tuple[str, Any]]] = None) -> List[Tuple[str, Any]]:
         """
         Laikinas "suppose": var domeną paliekam tik [value],
         o pašalintas reikšmes grąžinam per restore(removals).
+        Jei removals paduotas (pvz. Trail) — rašom į jį, naujo sąrašo nekuriam.
         """
         self.support_pruning()
         assert self.curr_domains is not None
-        removals = [(var, v) for v in self.curr_domains[var] if v != value]
+        if removals is None:
+            removals = []
+        removals.extend((var, v) for v in self.curr_domains[var] if v != value)
         self.curr_domains[var] = [value]
+        if self.var_order is not None:
+            self.var_order.update(var)
         return removals
 
     def prune(self, var: str, value: Any, removals: List[Tuple[str, Any]]) -> None:
@@ -94,16 +187,479 @@ class CSP:
         if value in self.curr_domains[var]:
             self.curr_domains[var].remove(value)
             removals.append((var, value))
+            if self.var_order is not None:
+                self.var_order.update(var)
 
     def choices(self, var: str) -> List[Any]:
         """Jei yra curr_domains — naudojam juos, kitaip originalų domeną."""
         return (self.curr_domains or self.domains)[var]
 
-    def restore(self, removals: List[Tuple[str, Any]]) -> None:
+    def restore(self, removals: Iterable[Tuple[str, Any]]) -> None:
         """Atstatom pruning metu pašalintas reikšmes."""
         assert self.curr_domains is not None
         for var, value in removals:
             self.curr_domains[var].append(value)
+            if self.var_order is not None:
+                self.var_order.update(var)
+
+    def domain_size(self, var: str) -> int:
+        """Kiek spalvų liko var domene (MRV naudoja šitą)."""
+        return len(self.choices(var))
+
+    def new_assignment(self) -> Dict[str, Any]:
+        """Tuščias priskyrimas, nuo kurio pradeda paieška."""
+        return {}
+
+    def unassigned_variables(self, assignment: Dict[str, Any]) -> List[str]:
+        return [v for v in self.variables if v not in assignment]
+
+    def decode(self, assignment: Dict[str, Any]) -> Dict[str, Any]:
+        """Priskyrimas -> {regionas: spalva} (čia tiesiog kopija)."""
+        return dict(assignment)
+
+    def encode(self, assignment: Dict[str, Any]) -> Dict[str, Any]:
+        """{regionas: spalva} -> priskyrimas (čia tiesiog kopija)."""
+        return dict(assignment)
+
+    def name(self, var: Any) -> str:
+        """Kintamasis -> regiono vardas (čia tas pats)."""
+        return var
+
+    def value(self, val: Any) -> Any:
+        """Domeno reikšmė -> spalva (čia ta pati)."""
+        return val
+
+    def compile(self) -> "CompiledCSP":
+        """Sukompiliuojam į CompiledCSP: regionai ir spalvos -> int indeksai."""
+        return CompiledCSP(self)
+
+    def subproblem(self, variables: List[str]) -> "CSP":
+        """Naujas CSP tik su šitais regionais (domenai — dabartiniai, kaimynai — tik viduje)."""
+        keep = set(variables)
+        return type(self)(
+            list(variables),
+            {v: list(self.choices(v)) for v in variables},
+            {v: [n for n in self.neighbors[v] if n in keep] for v in variables},
+            self.constraints,
+            self.different_values,
+        )
+
+    def edit_graph(
+        self,
+        added_edges: Iterable[Tuple[str, str]] = (),
+        removed_edges: Iterable[Tuple[str, str]] = (),
+        added_vars: Iterable[str] = (),
+    ) -> None:
+        """
+        Pakeičia kaimynystės grafą (nauji regionai gauna bendrą spalvų paletę).
+        Kuriamos naujos struktūros — iš išorės paduotas neighbors dict nekeičiamas.
+        """
+        palette = list(dict.fromkeys(c for v in self.variables for c in self.domains[v]))
+        variables = list(self.variables)
+        domains = dict(self.domains)
+        neighbors = {v: list(self.neighbors[v]) for v in variables}
+        for v in added_vars:
+            if v not in neighbors:
+                variables.append(v)
+                domains[v] = list(palette)
+                neighbors[v] = []
+        for a, b in removed_edges:
+            if b in neighbors.get(a, ()):
+                neighbors[a].remove(b)
+                neighbors[b].remove(a)
+        for a, b in added_edges:
+            for v in (a, b):
+                if v not in neighbors:
+                    variables.append(v)
+                    domains[v] = list(palette)
+                    neighbors[v] = []
+            if b not in neighbors[a]:
+                neighbors[a].append(b)
+                neighbors[b].append(a)
+        self.variables, self.domains, self.neighbors = variables, domains, neighbors
+        self.curr_domains = None
+        self.color_counts = self.counted = None
+        self.var_order = None
+
+    def bump_weight(self, a: Any, b: Any) -> None:
+        """Apribojimas a-b sukėlė domeno ištuštėjimą -> jo svoris +1 (abiem kryptimis)."""
+        w = self.weights.setdefault(a, {}).get(b, 1) + 1
+        self.weights[a][b] = w
+        self.weights.setdefault(b, {})[a] = w
+
+    def weighted_degree(self, var: Any, assignment: Dict[str, Any]) -> int:
+        """Apribojimų su nepriskirtais kaimynais svorių suma."""
+        w = self.weights.get(var, {})
+        return sum(w.get(n, 1) for n in self.neighbors[var] if n not in assignment)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # random modulio pickle'inti negalima (reikia ProcessPool'ui) -> pažymim None
+        state = self.__dict__.copy()
+        if state.get("rng") is random:
+            state["rng"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        if self.rng is None:
+            self.rng = random
+
+
+class BitsetCSP(CSP):
+    """
+    Tas pats CSP, tik curr_domains laikomi kaip int bitų kaukės:
+    i-tasis bitas = i-toji reikšmė iš self.values.
+    prune/restore/tikrinimas = viena bitų operacija, domeno dydis = popcount.
+    """
+
+    def __init__(
+        self,
+        variables: List[str],
+        domains: Dict[str, List[Any]],
+        neighbors: Dict[str, List[str]],
+        constraints: ConstraintFn,
+        different_values: Optional[bool] = None,
+    ):
+        super().__init__(variables, domains, neighbors, constraints, different_values)
+        # Visų reikšmių lentelė (tvarka kaip domenuose) -> bito pozicija
+        self.values: List[Any] = list(dict.fromkeys(val for v in variables for val in domains[v]))
+        self.bit: Dict[Any, int] = {val: 1 << i for i, val in enumerate(self.values)}
+        self._decoded: Dict[int, List[Any]] = {}   # kaukė -> reikšmių sąrašas (kešas)
+
+        self.curr_domains: Optional[Dict[str, int]] = None
+
+    def mask_of(self, values) -> int:
+        mask = 0
+        for val in values:
+            mask |= self.bit[val]
+        return mask
+
+    def values_of(self, mask: int) -> List[Any]:
+        """Kaukė -> reikšmių sąrašas (domeno tvarka). Rezultatas kešuojamas, jo nekeisti."""
+        vals = self._decoded.get(mask)
+        if vals is None:
+            vals = [val for i, val in enumerate(self.values) if mask >> i & 1]
+            self._decoded[mask] = vals
+        return vals
+
+    def support_pruning(self) -> None:
+        if self.curr_domains is None:
+            self.curr_domains = {v: self.mask_of(self.domains[v]) for v in self.variables}
+
+    def suppose(self, var: str, value: Any, removals: Optional[List[Tuple[str, Any]]] = None) -> List[Tuple[str, Any]]:
+        self.support_pruning()
+        assert self.curr_domains is not None
+        if removals is None:
+            removals = []
+        removals.extend((var, v) for v in self.values_of(self.curr_domains[var]) if v != value)
+        self.curr_domains[var] = self.bit[value]
+        if self.var_order is not None:
+            self.var_order.update(var)
+        return removals
+
+    def prune(self, var: str, value: Any, removals: List[Tuple[str, Any]]) -> None:
+        assert self.curr_domains is not None
+        b = self.bit[value]
+        if self.curr_domains[var] & b:
+            self.curr_domains[var] ^= b
+            removals.append((var, value))
+            if self.var_order is not None:
+                self.var_order.update(var)
+
+    def choices(self, var: str) -> List[Any]:
+        if self.curr_domains is None:
+            return self.domains[var]
+        return self.values_of(self.curr_domains[var])
+
+    def restore(self, removals: Iterable[Tuple[str, Any]]) -> None:
+        assert self.curr_domains is not None
+        for var, value in removals:
+            self.curr_domains[var] |= self.bit[value]
+            if self.var_order is not None:
+                self.var_order.update(var)
+
+    def domain_size(self, var: str) -> int:
+        """popcount: kiek bitų įjungta var kaukėje."""
+        if self.curr_domains is None:
+            return len(self.domains[var])
+        return self.curr_domains[var].bit_count()
+
+
+UNASSIGNED = -1  # IntAssignment reikšmė nepriskirtam regionui
+
+
+class IntAssignment:
+    """
+    Priskyrimas kaip int masyvas: values[i] = spalvos indeksas arba UNASSIGNED.
+    Palaiko dict sąsają (in, [], del, len, get, items), todėl tinka esamoms euristikoms,
+    o CompiledCSP branduoliai skaito values tiesiogiai.
+    """
+
+    __slots__ = ("values", "count")
+
+    def __init__(self, n: int):
+        self.values: List[int] = [UNASSIGNED] * n
+        self.count = 0
+
+    def __contains__(self, var: int) -> bool:
+        return self.values[var] != UNASSIGNED
+
+    def __getitem__(self, var: int) -> int:
+        val = self.values[var]
+        if val == UNASSIGNED:
+            raise KeyError(var)
+        return val
+
+    def __setitem__(self, var: int, val: int) -> None:
+        if self.values[var] == UNASSIGNED:
+            self.count += 1
+        self.values[var] = val
+
+    def __delitem__(self, var: int) -> None:
+        if self.values[var] == UNASSIGNED:
+            raise KeyError(var)
+        self.values[var] = UNASSIGNED
+        self.count -= 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        return (i for i, val in enumerate(self.values) if val != UNASSIGNED)
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        return ((i, val) for i, val in enumerate(self.values) if val != UNASSIGNED)
+
+    def get(self, var: int, default: Any = None) -> Any:
+        val = self.values[var]
+        return default if val == UNASSIGNED else val
+
+    def copy(self) -> "IntAssignment":
+        other = IntAssignment(0)
+        other.values = list(self.values)
+        other.count = self.count
+        return other
+
+
+class CompiledCSP(BitsetCSP):
+    """
+    CSP, kuriame regionai ir spalvos pakeisti tankiais int indeksais.
+    Kaimynystė — int sąrašų sąrašas (neighbors[i] = kaimynų indeksai, be dict paieškos),
+    domenai — bitų kaukės (bitas i = colors[i]), priskyrimas — IntAssignment.
+    Paieška vyksta tik su int; vardai grąžinami per decode() ir trace.
+    """
+
+    def __init__(self, source: CSP):
+        self.names: List[str] = list(source.variables)                 # indeksas -> regionas
+        self.index: Dict[str, int] = {v: i for i, v in enumerate(self.names)}
+        self.colors: List[Any] = list(dict.fromkeys(
+            val for v in self.names for val in source.domains[v]))     # indeksas -> spalva
+        color_index = {c: i for i, c in enumerate(self.colors)}
+
+        n = len(self.names)
+        rows = [[self.index[nb] for nb in source.neighbors[v]] for v in self.names]
+        domains = [[color_index[c] for c in source.domains[v]] for v in self.names]
+
+        self.source_constraints = source.constraints
+        constraints = source.constraints
+        if constraints is not different_values_constraint:
+            names, colors = self.names, self.colors
+
+            def constraints(A: int, a: int, B: int, b: int) -> bool:
+                return source.constraints(names[A], colors[a], names[B], colors[b])
+
+        super().__init__(list(range(n)), dict(enumerate(domains)), dict(enumerate(rows)), constraints,
+                         source.different_values)
+        # int indeksai -> sąrašai vietoj dict
+        self.domains = domains
+        self.neighbors = rows
+        self.values = list(range(len(self.colors)))
+        self.bit = [1 << i for i in self.values]
+
+    def support_pruning(self) -> None:
+        if self.curr_domains is None:
+            self.curr_domains = [self.mask_of(d) for d in self.domains]
+
+    def _new_color_counts(self) -> List[List[int]]:
+        return [[0] * len(self.colors) for _ in self.names]
+
+    def used_colors(self, var: int) -> int:
+        return count_true(c > 0 for c in self.color_counts[var])
+
+    def nconflicts(self, var: int, val: int, assignment: IntAssignment) -> int:
+        values = assignment.values
+        if self.different_values:
+            if assignment is self.counted:
+                return self.color_counts[var][val]
+            return [values[n] for n in self.neighbors[var]].count(val)
+        conflicts = 0
+        for n in self.neighbors[var]:
+            b = values[n]
+            if b != UNASSIGNED and not self.constraints(var, val, n, b):
+                conflicts += 1
+        return conflicts
+
+    def new_assignment(self) -> IntAssignment:
+        return IntAssignment(len(self.names))
+
+    def unassigned_variables(self, assignment: IntAssignment) -> List[int]:
+        return [i for i, val in enumerate(assignment.values) if val == UNASSIGNED]
+
+    def encode(self, assignment: Dict[str, Any]) -> IntAssignment:
+        """{regionas: spalva} -> IntAssignment."""
+        result = self.new_assignment()
+        color_index = {c: i for i, c in enumerate(self.colors)}
+        for v, c in assignment.items():
+            result[self.index[v]] = color_index[c]
+        return result
+
+    def decode(self, assignment: IntAssignment) -> Dict[str, Any]:
+        """IntAssignment -> {regionas: spalva}."""
+        names, colors = self.names, self.colors
+        return {names[i]: colors[val] for i, val in assignment.items()}
+
+    def name(self, var: int) -> str:
+        return self.names[var]
+
+    def value(self, val: int) -> Any:
+        return self.colors[val]
+
+    def compile(self) -> "CompiledCSP":
+        return self
+
+    def edit_graph(self, added_edges=(), removed_edges=(), added_vars=()) -> None:
+        raise TypeError("CompiledCSP cannot be edited: edit the source CSP and compile() it again")
+
+    def subproblem(self, variables: List[int]) -> "CompiledCSP":
+        keep = set(variables)
+        names = [self.names[i] for i in variables]
+        source = CSP(
+            names,
+            {self.names[i]: [self.colors[c] for c in self.choices(i)] for i in variables},
+            {self.names[i]: [self.names[j] for j in self.neighbors[i] if j in keep] for i in variables},
+            self.source_constraints,
+            self.different_values,
+        )
+        return source.compile()
+
+
+class Trail(list):
+    """
+    Vienas visos paieškos "trail" vietoj atskiro removals sąrašo kiekvienam mazgui.
+    Įrašai (var, value) dedami iš eilės, levels saugo lygių žymes (trail ilgį).
+    Atšaukimas = atstatom reikšmes nuo žymės ir nukerpam sąrašą iki jos.
+    Trail paduodamas vietoj removals, todėl prune/inference veikia be pakeitimų.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.levels: List[int] = []
+
+    def push_level(self) -> None:
+        self.levels.append(len(self))
+
+    def pop_level(self, csp: CSP) -> None:
+        mark = self.levels.pop()
+        csp.restore(islice(self, mark, None))
+        del self[mark:]
+
+
+class NogoodStore:
+    """
+    Išmoktų "nogood" saugykla: dalinis priskyrimas {(regionas, spalva), ...},
+    kurio negalima išplėsti iki sprendinio (CBJ konfliktų aibė nesėkmingam pomedžiui).
+    Indeksas pagal literalą (regionas, spalva) -> nogood'ai; dydis ribotas, išmetamas
+    seniausiai naudotas (LRU). Galioja tam pačiam CSP (ir kai domenai tik mažėja).
+    """
+
+    def __init__(self, capacity: int = 10_000):
+        self.capacity = capacity
+        self.entries: "OrderedDict[frozenset, None]" = OrderedDict()
+        self.by_literal: Dict[Tuple[Any, Any], set] = defaultdict(set)
+        self.added = 0
+        self.hits = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, nogood: Iterable[Tuple[Any, Any]]) -> None:
+        ng = frozenset(nogood)
+        if not ng or ng in self.entries:
+            return
+        self.entries[ng] = None
+        for lit in ng:
+            self.by_literal[lit].add(ng)
+        self.added += 1
+        if len(self.entries) > self.capacity:
+            old, _ = self.entries.popitem(last=False)
+            for lit in old:
+                self.by_literal[lit].discard(old)
+            self.evicted += 1
+
+    def violated(self, var: Any, value: Any, assignment: Dict[str, Any]) -> Optional[frozenset]:
+        """Ar priskyrimas + var=value pilnai apima kurį nors nogood? Grąžina jį arba None."""
+        for ng in self.by_literal.get((var, value), ()):
+            if all(x == var or assignment.get(x, _MISSING) == v for x, v in ng):
+                self.entries.move_to_end(ng)
+                self.hits += 1
+                return ng
+        return None
+
+
+_MISSING = object()
+
+
+def luby(i: int) -> int:
+    """Luby seka (i nuo 1): 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ..."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if i == (1 << k) - 1:
+        return 1 << (k - 1)
+    return luby(i - (1 << (k - 1)) + 1)
+
+
+class RestartLimit(Exception):
+    """Paieška viršijo šio paleidimo mazgų (priskyrimų) ribą."""
+
+
+class RestartPolicy:
+    """
+    Pakartotinių paleidimų (restarts) politika backtracking_search'ui.
+    Mazgų riba i-tajam paleidimui: base * luby(i + 1) arba base * factor**i ("geometric").
+    Po max_restarts paleidimų paskutinis vykdomas be ribos (paieška lieka pilna).
+    rng = random.Random(seed) — lygybių laužymas (mrv per csp.rng), todėl bandymai atkartojami.
+    stats — po įrašą kiekvienam paleidimui: run, limit, nodes, outcome ("limit" / "solved" / "unsat").
+    """
+
+    def __init__(self, schedule: str = "luby", base: int = 100, factor: float = 1.5,
+                 seed: Optional[int] = None, max_restarts: Optional[int] = None):
+        if schedule not in ("luby", "geometric"):
+            raise ValueError(f"Unknown restart schedule: {schedule!r}")
+        self.schedule = schedule
+        self.base = base
+        self.factor = factor
+        self.max_restarts = max_restarts
+        self.rng = random.Random(seed)
+        self.stats: List[Dict[str, Any]] = []
+        self.limit: Optional[int] = None
+        self.nodes = 0
+
+    def node_limit(self, run: int) -> Optional[int]:
+        if self.max_restarts is not None and run >= self.max_restarts:
+            return None
+        if self.schedule == "luby":
+            return self.base * luby(run + 1)
+        return int(self.base * self.factor ** run)
+
+    def count_node(self) -> None:
+        self.nodes += 1
+        if self.limit is not None and self.nodes > self.limit:
+            raise RestartLimit(self.nodes)
 
 
 # -----------------------------
@@ -112,14 +668,14 @@ class CSP:
 
 def first_unassigned_variable(assignment: Dict[str, Any], csp: CSP) -> str:
     """Paimam pirmą nepriskirtą regioną (paprasta strategija)."""
-    return first([v for v in csp.variables if v not in assignment])
+    return first(csp.unassigned_variables(assignment))
 
 
 def num_legal_values(csp: CSP, var: str, assignment: Dict[str, Any]) -> int:
     """Kiek legalių spalvų dar turi var pagal esamą priskyrimą."""
     if csp.curr_domains is not None:
         # Jei inference jau apkarpė domenus, tai tiesiog domeno dydis
-        return len(csp.curr_domains[var])
+        return csp.domain_size(var)
     # Kitu atveju skaičiuojam per konfliktus
     return count_true(csp.nconflicts(var, val, assignment) == 0 for val in csp.domains[var])
 
@@ -129,8 +685,102 @@ def mrv(assignment: Dict[str, Any], csp: CSP) -> str:
     MRV: parenkam regioną su mažiausiai likusių legalių spalvų.
     Naudinga, nes greičiau aptinka aklavietes.
     """
-    unassigned = [v for v in csp.variables if v not in assignment]
-    return argmin_random_tie(unassigned, key=lambda v: num_legal_values(csp, v, assignment))
+    unassigned = csp.unassigned_variables(assignment)
+    return argmin_random_tie(unassigned, key=lambda v: num_legal_values(csp, v, assignment), rng=csp.rng)
+
+
+def dom_wdeg(assignment: Dict[str, Any], csp: CSP) -> str:
+    """
+    dom/wdeg: mažiausias (legalių spalvų skaičius / apribojimų su nepriskirtais kaimynais svorių suma).
+    Svoriai (csp.weights) auga forward checking aklavietėse, todėl "sunkūs" regionai imami anksčiau.
+    """
+    def score(v: Any) -> float:
+        wdeg = csp.weighted_degree(v, assignment)
+        return num_legal_values(csp, v, assignment) / wdeg if wdeg else float("inf")
+
+    return argmin_random_tie(csp.unassigned_variables(assignment), key=score, rng=csp.rng)
+
+
+class MRVBuckets:
+    """
+    Nepriskirti regionai sudėti į "kibirus" pagal (domeno dydis, laipsnis).
+    CSP prune/restore/suppose kviečia update(), assign/unassign — discard()/add(),
+    todėl MRV pasirinkimas nebeskenuoja visų regionų.
+    """
+
+    def __init__(self, csp: CSP, assignment: Dict[str, Any]):
+        self.csp = csp
+        self.assignment = assignment
+        self.degree = {v: len(csp.neighbors[v]) for v in csp.variables}
+        self.buckets: Dict[int, Dict[int, List[str]]] = defaultdict(dict)  # dydis -> laipsnis -> regionai
+        self.where: Dict[str, Tuple[int, int]] = {}                        # regionas -> (dydis, laipsnis)
+        self.pos: Dict[str, int] = {}                                      # regionas -> vieta sąraše
+        for v in csp.unassigned_variables(assignment):
+            self.add(v)
+
+    def add(self, var: str) -> None:
+        key = (self.csp.domain_size(var), self.degree[var])
+        bag = self.buckets[key[0]].setdefault(key[1], [])
+        self.where[var] = key
+        self.pos[var] = len(bag)
+        bag.append(var)
+
+    def discard(self, var: str) -> None:
+        key = self.where.pop(var, None)
+        if key is None:
+            return
+        by_degree = self.buckets[key[0]]
+        bag = by_degree[key[1]]
+        i = self.pos.pop(var)
+        last = bag.pop()
+        if last != var:
+            bag[i] = last
+            self.pos[last] = i
+        if not bag:
+            del by_degree[key[1]]
+            if not by_degree:
+                del self.buckets[key[0]]
+
+    def update(self, var: str) -> None:
+        key = self.where.get(var)
+        if key is not None and key[0] != self.csp.domain_size(var):
+            self.discard(var)
+            self.add(var)
+
+    def select(self, rng: Any = random) -> str:
+        """Mažiausias domenas, tada didžiausias laipsnis, likusi lygybė — atsitiktinai."""
+        by_degree = self.buckets[min(self.buckets)]
+        return rng.choice(by_degree[max(by_degree)])
+
+
+def mrv_bucketed(assignment: Dict[str, Any], csp: CSP) -> str:
+    """
+    MRV su MRVBuckets: (domeno dydis, -laipsnis) pasirinkimas be pilno skenavimo.
+    Struktūra sukuriama pirmo kvietimo metu ir gyvena iki paieškos pabaigos.
+    """
+    if csp.var_order is None or csp.var_order.assignment is not assignment:
+        csp.support_pruning()
+        csp.var_order = MRVBuckets(csp, assignment)
+    return csp.var_order.select(csp.rng)
+
+
+def saturation(csp: CSP, var: str, assignment: Dict[str, Any]) -> int:
+    """Kiek skirtingų spalvų jau turi var kaimynai."""
+    if assignment is csp.counted:
+        return csp.used_colors(var)
+    return len({assignment[n] for n in csp.neighbors[var] if n in assignment})
+
+
+def dsatur(assignment: Dict[str, Any], csp: CSP) -> str:
+    """
+    DSatur: regionas, kurio kaimynai jau naudoja daugiausiai skirtingų spalvų,
+    lygybės atveju — daugiausiai dar nenuspalvintų kaimynų.
+    """
+    def key(v):
+        uncolored = count_true(n not in assignment for n in csp.neighbors[v])
+        return (-saturation(csp, v, assignment), -uncolored)
+
+    return argmin_random_tie(csp.unassigned_variables(assignment), key=key, rng=csp.rng)
 
 
 def unordered_domain_values(var: str, assignment: Dict[str, Any], csp: CSP) -> List[Any]:
@@ -162,51 +812,521 @@ def forward_checking(csp: CSP, var: str, value: Any, assignment: Dict[str, Any],
     csp.support_pruning()
     assert csp.curr_domains is not None
 
-    for B in csp.neighbors.get(var, []):
+    if csp.different_values:
+        # Greitas kelias: kaimynui tiesiog išmetam tą pačią spalvą
+        for B in csp.neighbors[var]:
+            if B in assignment:
+                continue
+            csp.prune(B, value, removals)
+            if not csp.curr_domains[B]:
+                csp.bump_weight(var, B)
+                return False
+        return True
+
+    for B in csp.neighbors[var]:
         if B in assignment:
             continue
-        for b in list(csp.curr_domains[B]):
+        for b in list(csp.choices(B)):
             if not csp.constraints(var, value, B, b):
                 csp.prune(B, b, removals)
         if not csp.curr_domains[B]:
+            csp.bump_weight(var, B)
             return False
     return True
 
 
+def revise(csp: CSP, Xi: str, Xj: str, removals: List[Tuple[str, Any]]) -> bool:
+    """Išmetam iš Xi domeno spalvas, kurioms Xj domene neliko jokios suderinamos spalvos."""
+    if csp.different_values:
+        # x neturi atramos tik tada, kai Xj domene liko vienintelė spalva x
+        ys = csp.choices(Xj)
+        if len(ys) == 1 and ys[0] in csp.choices(Xi):
+            csp.prune(Xi, ys[0], removals)
+            return True
+        return False
+    revised = False
+    for x in list(csp.choices(Xi)):
+        if not any(csp.constraints(Xi, x, Xj, y) for y in csp.choices(Xj)):
+            csp.prune(Xi, x, removals)
+            revised = True
+    return revised
+
+
+def AC3(
+    csp: CSP,
+    queue: Optional[Iterable[Tuple[str, str]]] = None,
+    removals: Optional[List[Tuple[str, Any]]] = None,
+) -> Tuple[bool, int]:
+    """
+    Lankų suderinamumas (AC-3).
+    Be queue — visi lankai (preprocessing prieš paiešką, curr_domains lieka apkarpyti).
+    Grąžina (ar nėra tuščio domeno, kiek lankų revizuota).
+    """
+    csp.support_pruning()
+    if queue is None:
+        queue = [(Xi, Xk) for Xi in csp.variables for Xk in csp.neighbors[Xi]]
+    if removals is None:
+        removals = []
+
+    queue = deque(queue)
+    queued = set(queue)
+    revisions = 0
+    while queue:
+        arc = queue.popleft()
+        queued.discard(arc)
+        Xi, Xj = arc
+        if revise(csp, Xi, Xj, removals):
+            revisions += 1
+            csp.nrevisions += 1
+            if csp.domain_size(Xi) == 0:
+                return False, revisions
+            for Xk in csp.neighbors[Xi]:
+                if Xk != Xj and (Xk, Xi) not in queued:
+                    queue.append((Xk, Xi))
+                    queued.add((Xk, Xi))
+    return True, revisions
+
+
+def mac(csp: CSP, var: str, value: Any, assignment: Dict[str, Any], removals: List[Tuple[str, Any]]) -> bool:
+    """
+    MAC (Maintaining Arc Consistency):
+    po var=value paleidžiam AC3 tik nuo lankų (kaimynas, var).
+    Revizijų skaičius kaupiamas csp.nrevisions.
+    """
+    ok, _ = AC3(csp, [(X, var) for X in csp.neighbors[var]], removals)
+    return ok
+
+
 # -----------------------------
 # Backtracking search (DFS)
 # -----------------------------
-#########################################################################################################[#2]
-def backtracking_search(
-    csp: CSP,
-    select_unassigned_variable= mrv,
-    order_domain_values     = lcv,
-    inference               = forward_checking,
-    trace: Optional[List[Dict[str, Any]]] = None,   # Jei paduosi [], kaups žingsnius vizualizacijai
-    max_steps: Optional[int] = None,                # Apsauga, kad trace neišsipūstų
-) -> Optional[Dict[str, Any]]:
+def color_palette(csp: CSP) -> List[Any]:
     """
-    Backtracking (DFS) mapos spalvinimui.
-    trace įrašai: TRY, CONFLICT, ASSIGN, INFER_FAIL, BACKTRACK, GOAL
+    Bendra spalvų paletė simetrijos laužymui (indeksas = spalvos numeris).
+    Spalvos sukeičiamos tik kai apribojimas "skirtingos spalvos" ir visų regionų dabartiniai
+    domenai (csp.choices, t.y. curr_domains po pruning) vienodi.
+    """
+    if not csp.different_values:
+        raise ValueError("symmetry breaking needs a different-values CSP")
+    palette = list(dict.fromkeys(c for v in csp.variables for c in csp.choices(v)))
+    if any(set(csp.choices(v)) != set(palette) for v in csp.variables):
+        raise ValueError("symmetry breaking needs identical current domains for all variables")
+    return palette
+
+
+def count_color_permutations(solution: Dict[str, Any], colors: List[Any]) -> int:
+    """Kiek skirtingų sprendinių gaunama perstatant spalvas (k! / (k - panaudota)!)."""
+    return perm(len(colors), len(set(solution.values())))
+
+
+def expand_color_permutations(solution: Dict[str, Any], colors: List[Any]):
+    """Generatorius: visi sprendiniai, gaunami panaudotas spalvas injektyviai pakeitus kitomis."""
+    used = list(dict.fromkeys(c for c in colors if c in set(solution.values())))
+    for image in permutations(colors, len(used)):
+        relabel = dict(zip(used, image))
+        yield {v: relabel[c] for v, c in solution.items()}
+
+
+def trace_event(
+    csp: CSP, step: int, event: str, assignment: Dict[str, Any], var: Any = None, val: Any = None, snapshot: bool = True
+) -> Dict[str, Any]:
+    """Vienas trace įrašas (CompiledCSP atveju indeksai verčiami atgal į vardus); snapshot=False -> be assignment kopijos."""
+    if var is not None:
+        var, val = csp.name(var), csp.value(val)
+    event_row = {
+        "step": step,
+        "depth": len(assignment),
+        "event": event,
+        "var": var,
+        "val": val,
+    }
+    if snapshot:
+        event_row["assignment"] = csp.decode(assignment)  # snapshot
+    return event_row
+
+
+class TraceLog:
+    """
+    Trace rašymas pačios paieškos metu.
+    step skaičiuoja visus įvykius (ir atfiltruotus), todėl numeracija tokia pati kaip pilno trace.
+    events: kuriuos įvykius įrašyti (None -> visus); filtras taikomas prieš kuriant įrašą.
+    mode="full": kiekvienas įrašas su assignment kopija (O(n) žingsniui);
+    mode="delta": tik (step, depth, event, var, val), snapshot'ai atkuriami replay_trace.
+    trace — bet kas su append(), pvz. collections.deque(maxlen=N) laiko tik paskutinius N įvykių,
+    arba TraceSink (įrašai rašomi į failą, visada delta).
     """
 
-    step = 0
+    def __init__(
+        self,
+        trace: Any,
+        max_steps: Optional[int] = None,
+        events: Optional[Iterable[str]] = None,
+        mode: str = "full",
+    ):
+        if mode not in ("full", "delta"):
+            raise ValueError(f"Unknown trace mode: {mode!r}")
+        self.trace = trace
+        self.max_steps = max_steps
+        self.events = None if events is None else frozenset(events)
+        self.snapshot = mode == "full" and not isinstance(trace, TraceSink)
+        if isinstance(trace, TraceSink):
+            self.step = trace.step
+        else:
+            self.step = trace[-1]["step"] if trace else 0
+
+    def __call__(self, csp: CSP, event: str, assignment: Dict[str, Any], var: Any = None, val: Any = None) -> None:
+        self.step += 1
+        if self.max_steps is not None and self.step > self.max_steps:
+            raise RuntimeError(f"Trace exceeded max_steps={self.max_steps}.")
+        if self.events is None or event in self.events:
+            self.trace.append(trace_event(csp, self.step, event, assignment, var, val, self.snapshot))
+
+
+def replay_trace(trace: Iterable[Dict[str, Any]]):
+    """
+    Generatorius: delta trace įrašai su atkurtu "assignment" (kaip mode="full").
+    Reikia ASSIGN, BACKTRACK, BACKJUMP ir RESTART įvykių nuo pat pradžios;
+    jei jų trūksta (filtras, ring buffer), gylis nesutampa -> ValueError.
+    """
+    current: Dict[str, Any] = {}
+    for row in trace:
+        event = row["event"]
+        if event == "ASSIGN":
+            current[row["var"]] = row["val"]
+        elif event in ("BACKTRACK", "BACKJUMP"):
+            current.pop(row["var"], None)
+        elif event == "RESTART":
+            current.clear()
+        if len(current) != row["depth"]:
+            raise ValueError(f"Trace cannot be replayed at step {row['step']} (missing events).")
+        yield {**row, "assignment": dict(current)}
 
-    def log(event: str, assignment: Dict[str, Any], var: Optional[str] = None, val: Any = None):
-        nonlocal step
-        if trace is None:
+
+TRACE_FIELDS = ("step", "depth", "event", "var", "val")
+
+
+class TraceSink(ABC):
+    """
+    Trace rašymas tiesiai į failą paieškos metu (vietoj sąrašo): trace=JsonlTraceSink(path).
+    Įrašai kaupiami buferyje ir rašomi po batch_size, todėl atmintis nepriklauso nuo žingsnių skaičiaus.
+    Rašomi tik TRACE_FIELDS (delta įrašai, be assignment); snapshot'us atkuria replay_trace(read_trace(path)).
+    Failas su ".gz" galūne rašomas per gzip.
+    """
+
+    def __init__(self, path: Any, batch_size: int = 1000):
+        self.file = self.open(str(path))
+        self.batch_size = batch_size
+        self.buffer: List[Dict[str, Any]] = []
+        self.step = 0  # paskutinio įrašyto įvykio step (TraceLog tęsia numeraciją)
+        self.count = 0
+
+    def open(self, path: str) -> Any:
+        opener = gzip.open if path.endswith(".gz") else open
+        return opener(path, "wt", encoding="utf-8", newline="")
+
+    def append(self, row: Dict[str, Any]) -> None:
+        self.buffer.append({k: row[k] for k in TRACE_FIELDS})
+        self.step = row["step"]
+        self.count += 1
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            rows, self.buffer = self.buffer, []
+            self.write_rows(rows)
+        self.file.flush()
+
+    @abstractmethod
+    def write_rows(self, rows: List[Dict[str, Any]]) -> None:
+        """Įrašo buferio partiją į failą."""
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> "TraceSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class JsonlTraceSink(TraceSink):
+    """Vienas JSON objektas eilutėje."""
+
+    def write_rows(self, rows: List[Dict[str, Any]]) -> None:
+        self.file.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+
+
+class CsvTraceSink(TraceSink):
+    """CSV su antrašte TRACE_FIELDS (None -> tuščias laukas)."""
+
+    def __init__(self, path: Any, batch_size: int = 1000):
+        super().__init__(path, batch_size)
+        self.writer = csv.DictWriter(self.file, fieldnames=TRACE_FIELDS)
+        self.writer.writeheader()
+
+    def write_rows(self, rows: List[Dict[str, Any]]) -> None:
+        self.writer.writerows(rows)
+
+
+def read_trace(path: Any):
+    """Generatorius: JsonlTraceSink / CsvTraceSink failo įrašai (.jsonl, .csv, su .gz arba be) po vieną."""
+    path = str(path)
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        if path.removesuffix(".gz").endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield {
+                    "step": int(row["step"]),
+                    "depth": int(row["depth"]),
+                    "event": row["event"],
+                    "var": row["var"] or None,
+                    "val": row["val"] or None,
+                }
+        else:
+            for line in f:
+                yield json.loads(line)
+
+
+TRACE_EVENTS = ("TRY", "CONFLICT", "ASSIGN", "INFER_FAIL", "BACKTRACK", "GOAL", "BACKJUMP", "RESTART")
+TRACE_MAGIC = b"CSPTRACE"
+# magic, versija, regionų sk., spalvų sk., checkpoint intervalas, lentelių ilgis, įrašų sk., indekso poslinkis
+TRACE_HEADER = struct.Struct("<8sIIIIIQQ")
+# step, depth, regiono indeksas (-1 -> None), spalvos indeksas (-1 -> None), įvykio kodas
+TRACE_RECORD = struct.Struct("<QIihBx")
+
+
+class BinaryTraceSink(TraceSink):
+    """
+    Kompaktiškas dvejetainis trace: antraštė + regionų/spalvų lentelės (JSON) + fiksuoto pločio įrašai
+    (TRACE_RECORD, 20 baitų) + checkpoint indeksas faile pabaigoje.
+    Kas interval įrašų išsaugomas pilnas priskyrimas (int16 spalvos indeksas regionui, -1 -> nepriskirta)
+    prieš tą įrašą, todėl BinaryTrace.snapshot(i) perskaito ne daugiau kaip interval įrašų.
+    Indeksas ir įrašų skaičius įrašomi close() metu; failas neglaudinamas (skaitomas per mmap).
+    Reikia ASSIGN, BACKTRACK, BACKJUMP ir RESTART įvykių (be log_events filtro), kitaip ValueError.
+    """
+
+    def __init__(self, path: Any, csp: CSP, interval: int = 10_000, batch_size: int = 1000):
+        variables = [csp.name(v) for v in csp.variables]
+        colors = list(dict.fromkeys(csp.value(c) for v in csp.variables for c in csp.domains[v]))
+        self.var_index = {v: i for i, v in enumerate(variables)}
+        self.color_index = {c: i for i, c in enumerate(colors)}
+        self.event_code = {e: i for i, e in enumerate(TRACE_EVENTS)}
+        self.interval = interval
+        self.tables = json.dumps({"variables": variables, "colors": colors, "events": TRACE_EVENTS},
+                                 ensure_ascii=False).encode("utf-8")
+        self.tables += b" " * (-(TRACE_HEADER.size + len(self.tables)) % 8)
+        self.current = array("h", [-1]) * len(variables)
+        self.assigned = 0
+        self.records = 0
+        self.checkpoints: List[bytes] = []
+        super().__init__(path, batch_size)
+        self.file.write(self.header(0))
+        self.file.write(self.tables)
+
+    def open(self, path: str) -> Any:
+        if path.endswith(".gz"):
+            raise ValueError("Binary trace cannot be gzipped (it is read through mmap).")
+        return open(path, "wb")
+
+    def header(self, index_offset: int) -> bytes:
+        return TRACE_HEADER.pack(TRACE_MAGIC, 1, len(self.var_index), len(self.color_index), self.interval,
+                                 len(self.tables), self.records, index_offset)
+
+    def write_rows(self, rows: List[Dict[str, Any]]) -> None:
+        out = bytearray()
+        current = self.current
+        for row in rows:
+            if self.records % self.interval == 0:
+                self.checkpoints.append(current.tobytes())
+            var = -1 if row["var"] is None else self.var_index[row["var"]]
+            val = -1 if row["val"] is None else self.color_index[row["val"]]
+            event = row["event"]
+            if event == "ASSIGN":
+                self.assigned += current[var] < 0
+                current[var] = val
+            elif event in ("BACKTRACK", "BACKJUMP"):
+                self.assigned -= current[var] >= 0
+                current[var] = -1
+            elif event == "RESTART":
+                current[:] = array("h", [-1]) * len(current)
+                self.assigned = 0
+            if self.assigned != row["depth"]:
+                raise ValueError(f"Binary trace needs every ASSIGN/BACKTRACK event (step {row['step']}).")
+            out += TRACE_RECORD.pack(row["step"], row["depth"], var, val, self.event_code[event])
+            self.records += 1
+        self.file.write(out)
+
+    def close(self) -> None:
+        if self.file.closed:
             return
-        step += 1
-        if max_steps is not None and step > max_steps:
-            raise RuntimeError(f"Trace exceeded max_steps={max_steps}.")
-        trace.append({
+        self.flush()
+        index_offset = self.file.tell()
+        self.file.write(b"".join(self.checkpoints))
+        self.file.seek(0)
+        self.file.write(self.header(index_offset))
+        super().close()
+
+
+class BinaryTrace:
+    """
+    BinaryTraceSink failo skaitymas per mmap: trace[i] ir snapshot(i) neskaito viso failo.
+    index_of(step) — įrašo indeksas pagal step (dvejetainė paieška, step didėja).
+    """
+
+    def __init__(self, path: Any):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _, n_vars, _, self.interval, tables_len, self.records, self.index_offset = \
+            TRACE_HEADER.unpack_from(self.map, 0)
+        if magic != TRACE_MAGIC:
+            raise ValueError(f"Not a binary trace: {path}")
+        if self.index_offset == 0:
+            raise ValueError(f"Binary trace was not closed: {path}")
+        tables = json.loads(bytes(self.map[TRACE_HEADER.size:TRACE_HEADER.size + tables_len]))
+        self.variables, self.colors, self.events = tables["variables"], tables["colors"], tables["events"]
+        self.codes = {e: i for i, e in enumerate(self.events)}
+        self.data_offset = TRACE_HEADER.size + tables_len
+        self.checkpoint_size = 2 * n_vars
+
+    def __len__(self) -> int:
+        return self.records
+
+    def record(self, i: int) -> Tuple[int, int, int, int, int]:
+        """(step, depth, regiono indeksas, spalvos indeksas, įvykio kodas) be vardų vertimo."""
+        if i < 0:
+            i += self.records
+        if not 0 <= i < self.records:
+            raise IndexError(i)
+        return TRACE_RECORD.unpack_from(self.map, self.data_offset + i * TRACE_RECORD.size)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        step, depth, var, val, event = self.record(i)
+        return {
             "step": step,
-            "depth": len(assignment),
-            "event": event,
-            "var": var,
-            "val": val,
-            "assignment": dict(assignment),  # snapshot
-        })
+            "depth": depth,
+            "event": self.events[event],
+            "var": None if var < 0 else self.variables[var],
+            "val": None if val < 0 else self.colors[val],
+        }
+
+    def __iter__(self):
+        return (self[i] for i in range(self.records))
+
+    def index_of(self, step: int) -> int:
+        i = bisect_left(range(self.records), step, key=lambda j: self.record(j)[0])
+        if i == self.records or self.record(i)[0] != step:
+            raise KeyError(step)
+        return i
+
+    def snapshot(self, i: int) -> Dict[str, Any]:
+        """Priskyrimas po i-ojo įrašo: artimiausias checkpoint + ne daugiau kaip interval įrašų."""
+        if i < 0:
+            i += self.records
+        if not 0 <= i < self.records:
+            raise IndexError(i)
+        k = i // self.interval
+        start = self.index_offset + k * self.checkpoint_size
+        current = array("h")
+        current.frombytes(self.map[start:start + self.checkpoint_size])
+        codes = self.codes
+        for j in range(k * self.interval, i + 1):
+            _, _, var, val, event = self.record(j)
+            if event == codes["ASSIGN"]:
+                current[var] = val
+            elif event in (codes["BACKTRACK"], codes["BACKJUMP"]):
+                current[var] = -1
+            elif event == codes["RESTART"]:
+                current = array("h", [-1]) * len(current)
+        return {self.variables[v]: self.colors[c] for v, c in enumerate(current) if c >= 0}
+
+    def close(self) -> None:
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self) -> "BinaryTrace":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _search(
+    csp: CSP,
+    select_unassigned_variable,
+    order_domain_values,
+    inference,
+    tracer: Optional[TraceLog],
+    undo: str,
+    engine: str,
+    backjumping: bool,
+    nogoods: Optional[NogoodStore],
+    symmetry_breaking: bool,
+    restarts: Optional[RestartPolicy] = None,
+):
+    """
+    Paieškos variklis (generatorius): backtracking_search ima pirmą sprendinį, iter_solutions — visus.
+    Parametrai kaip backtracking_search. Rekursinis ir CBJ variantai duoda ne daugiau kaip vieną sprendinį.
+    restarts: kiekvienas priskyrimas skaičiuojamas restarts.count_node() (viršijus ribą — RestartLimit).
+    tracer: TraceLog (žingsniai tęsia paskutinio trace įrašo numeraciją) arba None.
+    """
+    if undo not in ("removals", "trail"):
+        raise ValueError(f"Unknown undo mode: {undo!r}")
+    if engine not in ("recursive", "iterative"):
+        raise ValueError(f"Unknown engine: {engine!r}")
+    if backjumping and engine != "recursive":
+        raise ValueError("backjumping is only available with engine='recursive'")
+    if nogoods is not None and not backjumping:
+        raise ValueError("nogoods require backjumping=True (conflict sets come from CBJ)")
+
+    trail = Trail() if undo == "trail" else None
+
+    # Simetrijos laužymas: spalvų paletė ir kiek regionų naudoja kiekvieną spalvą
+    palette = color_palette(csp) if symmetry_breaking else None
+    color_pos = {c: i for i, c in enumerate(palette or ())}
+    color_use = [0] * len(color_pos)
+
+    def assign(var: Any, value: Any, assignment: Dict[str, Any]) -> None:
+        if restarts is not None:
+            restarts.count_node()
+        csp.assign(var, value, assignment)
+        if palette is not None:
+            color_use[color_pos[value]] += 1
+
+    def unassign(var: Any, assignment: Dict[str, Any]) -> None:
+        if palette is not None and var in assignment:
+            color_use[color_pos[assignment[var]]] -= 1
+        csp.unassign(var, assignment)
+
+    def sym_filter(values: List[Any]) -> List[Any]:
+        if palette is None:
+            return values
+        top = len(color_use) - 1
+        while top >= 0 and not color_use[top]:
+            top -= 1
+        return [v for v in values if color_pos[v] <= top + 1]
+
+    def suppose(var: str, value: Any) -> List[Tuple[str, Any]]:
+        if trail is None:
+            return csp.suppose(var, value)
+        trail.push_level()
+        return csp.suppose(var, value, trail)
+
+    def restore(removals: List[Tuple[str, Any]]) -> None:
+        if trail is None:
+            csp.restore(removals)
+        else:
+            trail.pop_level(csp)
+
+    def log(event: str, assignment: Dict[str, Any], var: Optional[str] = None, val: Any = None):
+        if tracer is not None:
+            tracer(csp, event, assignment, var, val)
 # assignment yra daline busena priskyrimas sudarytas is regiono ir spalvos
     #cia tikrina ar galine busena pasiekta
     ##########################################################################################[#4]
@@ -251,7 +1371,7 @@ def backtracking_search(
             # Grąžinam aukštyn — visi steko frame'ai susipopo'ins automatiškai per return.
 
             log("GOAL", assignment)
-            return dict(assignment)
+            return assignment.copy()
 
             # regionas
         #čia parenkamas regionas per MRV euristika minimum remaining value paduodant parametrus, kad nustayti kuris regionas turi maziausiai galimu legaliu spalvu
@@ -266,7 +1386,7 @@ def backtracking_search(
             # tai MRV gali parinkti 'Panevėžio', jei jam liko mažiausiai legalių spalvų.
             # spalva
         ##########################################################################################[#7]
-        for value in order_domain_values(var, assignment, csp): # CIKLAS RIKIUOJANTIS SPALVAS (kiek konfliktų ši spalva sukeltų su jau nuspalvintais kaimynais, Grąžina surikiuotą sąrašą, ir tada for ciklas eina per jį nuo pradžios iki galo.)
+        for value in sym_filter(order_domain_values(var, assignment, csp)): # CIKLAS RIKIUOJANTIS SPALVAS (kiek konfliktų ši spalva sukeltų su jau nuspalvintais kaimynais, Grąžina surikiuotą sąrašą, ir tada for ciklas eina per jį nuo pradžios iki galo.)
 
             # Bandom spalvas LCV tvarka (pirmiau tos, kurios mažiausiai “užspaudžia” kaimynus).
             # Pvz. spalvos: 'R' -> 'G' -> 'B' -> 'Y'
@@ -294,7 +1414,7 @@ def backtracking_search(
                 continue
             #Priskyrimu saraso papildymas {Regionas: spalva}
             #########################################################################################[#9]
-            csp.assign(var, value, assignment)
+            assign(var, value, assignment)
             # =========================
             # DUOMENYS PASIKEIČIA (priskyrimas padidėja)
             # =========================
@@ -308,7 +1428,7 @@ def backtracking_search(
 
             # atmestos, nes pagal apribojimus jos nebegali būti teisingos šiame paieškos žingsnyje.“
             #########################################################################################[#10]
-            removals = csp.suppose(var, value) # Cia issaugomos atmestos reiskmes, jeigu reikes grizti zingsniu atgal,
+            removals = suppose(var, value) # Cia issaugomos atmestos reiskmes, jeigu reikes grizti zingsniu atgal,
             # Domenų “pririšimas”: regionui paliekam tik vieną spalvą,
             # o ką išmetėm – įrašom į pasalinimai (kad galėtume atstatyti).
 
@@ -350,13 +1470,13 @@ def backtracking_search(
 
             #########################################################################################[#14]
             # Jei ok==False (inference aklavietė) arba gilyn grįžo None:
-            csp.restore(removals) # grizimas atgal pagal busena praejusia
+            restore(removals) # grizimas atgal pagal busena praejusia
             # =========================
             # DUOMENYS PASIKEIČIA (domenai atstatomi)
             # =========================
             # Atstatom visas inference/suppose metu išmestas galimas spalvas.
 
-            csp.unassign(var, assignment) # atstatymas
+            unassign(var, assignment) # atstatymas
             # =========================
             # DUOMENYS PASIKEIČIA (priskyrimas sumažėja)
             # =========================
@@ -378,15 +1498,987 @@ def backtracking_search(
         # tada visos 3 spalvos konfliktuoja => grįžtam None.
 
         return None #Where result becomes none
+
+    def backtrack_iterative(assignment: Dict[str, Any]):
+        """
+        Tas pats kaip backtrack(), tik Call Stack pakeistas aiškiu steku.
+        Kadras = [regionas, spalvų iteratorius, bandoma spalva, removals (arba Trail)].
+        removals is not None reiškia: iš šio kadro nusileista gilyn su šita spalva.
+        Generatorius: po GOAL paieška tęsiama toliau (kitas sprendinys);
+        uždarius generatorių, likę kadrai atšaukiami (domenai ir priskyrimas atstatomi).
+        """
+        stack: List[List[Any]] = []
+        try:
+            while True:
+                # PUSH: naujas lygis (kaip rekursinio backtrack pradžia)
+                if len(assignment) == len(csp.variables):
+                    log("GOAL", assignment)
+                    yield assignment.copy()
+                else:
+                    var = select_unassigned_variable(assignment, csp)
+                    stack.append([var, iter(sym_filter(order_domain_values(var, assignment, csp))), None, None])
+
+                while stack:
+                    frame = stack[-1]
+                    var, values, value, removals = frame
+                    if removals is not None:
+                        # Grįžom iš nesėkmingo gilesnio lygio -> atšaukiam šitą spalvą
+                        frame[2] = frame[3] = None
+                        restore(removals)
+                        unassign(var, assignment)
+                        log("BACKTRACK", assignment, var, value)
+
+                    descended = False
+                    for value in values:
+                        log("TRY", assignment, var, value)
+                        if csp.nconflicts(var, value, assignment) != 0:
+                            log("CONFLICT", assignment, var, value)
+                            continue
+                        assign(var, value, assignment)
+                        log("ASSIGN", assignment, var, value)
+                        removals = suppose(var, value)
+                        if inference(csp, var, value, assignment, removals):
+                            frame[2], frame[3] = value, removals
+                            descended = True
+                            break
+                        log("INFER_FAIL", assignment, var, value)
+                        restore(removals)
+                        unassign(var, assignment)
+                        log("BACKTRACK", assignment, var, value)
+
+                    if descended:
+                        break
+                    # POP: spalvos baigėsi -> aklavietė šitame lygyje
+                    stack.pop()
+                else:
+                    return
+        finally:
+            for var, _, _, removals in reversed(stack):
+                if removals is not None:
+                    restore(removals)
+                    unassign(var, assignment)
+
     #cia pagrindinis PIRMAS kvietimas ivyksta
     #sanity check
     ##########################################################################################[#3]
-    result = backtrack({})
-    if result is not None and not is_goal(result):
+    # pruned_by[B] = kurie priskirti regionai (eilės tvarka) išmetė spalvas iš B domeno
+    pruned_by: Dict[Any, List[Any]] = defaultdict(list)
+
+    def conflict_culprits(var: Any, value: Any, assignment: Dict[str, Any]) -> set:
+        """Priskirti kaimynai, su kuriais var=value konfliktuoja."""
+        return {n for n in csp.neighbors[var]
+                if n in assignment and not csp.constraints(var, value, n, assignment[n])}
+
+    def wipeout_culprits(var: Any, assignment: Dict[str, Any]) -> set:
+        """Kas kaltas, kad inference ištuštino domeną po var priskyrimo."""
+        if inference is forward_checking:
+            culprits = set()
+            for B in csp.neighbors[var]:
+                if B not in assignment and csp.domain_size(B) == 0:
+                    culprits.update(pruned_by[B])
+            return culprits
+        # MAC ir kt. — tikslios priežasties nežinom, kaltinam visus priskirtus (saugu)
+        return set(assignment)
+
+    def backjump(assignment: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], set]:
+        """
+        Rekursinis CBJ. Grąžina (sprendinys, None) arba (None, konfliktų aibė).
+        Jei var nėra vaiko konfliktų aibėje — šitas lygis aklavietei nesvarbus, šokam aukščiau.
+        """
+        if len(assignment) == len(csp.variables):
+            log("GOAL", assignment)
+            return assignment.copy(), set()
+
+        var = select_unassigned_variable(assignment, csp)
+        conf: set = set()
+        ordered = order_domain_values(var, assignment, csp)
+        values = sym_filter(ordered)
+        if len(values) < len(ordered):
+            # simetrijos atmestos spalvos priklauso nuo viso priskyrimo
+            conf |= set(assignment)
+        for value in values:
+            log("TRY", assignment, var, value)
+            if csp.nconflicts(var, value, assignment) != 0:
+                conf |= conflict_culprits(var, value, assignment)
+                log("CONFLICT", assignment, var, value)
+                continue
+            if nogoods is not None:
+                ng = nogoods.violated(var, value, assignment)
+                if ng is not None:
+                    conf |= {x for x, _ in ng if x != var}
+                    log("CONFLICT", assignment, var, value)
+                    continue
+
+            assign(var, value, assignment)
+            log("ASSIGN", assignment, var, value)
+            removals = suppose(var, value)
+            start = len(removals)
+            ok = inference(csp, var, value, assignment, removals)
+            touched = list(dict.fromkeys(B for B, _ in islice(removals, start, None) if B != var))
+            for B in touched:
+                pruned_by[B].append(var)
+
+            if ok:
+                result, child_conf = backjump(assignment)
+                if result is not None:
+                    return result, set()
+                jump = var not in child_conf
+                conf |= child_conf - {var}
+            else:
+                log("INFER_FAIL", assignment, var, value)
+                conf |= wipeout_culprits(var, assignment) - {var}
+                jump = False
+
+            for B in touched:
+                pruned_by[B].pop()
+            restore(removals)
+            unassign(var, assignment)
+            if jump:
+                # var nieko dėtas -> likusių spalvų nebandom, grįžtam aukščiau
+                log("BACKJUMP", assignment, var, value)
+                return None, child_conf
+            log("BACKTRACK", assignment, var, value)
+
+        # Visos spalvos išbandytos: kaltininkai + tie, kas apkarpė var domeną
+        conf.update(pruned_by[var])
+        conf.discard(var)
+        if nogoods is not None:
+            nogoods.add((x, assignment[x]) for x in conf)
+        return None, conf
+
+    start = csp.new_assignment()
+    csp.track_conflicts(start)  # kaimynų spalvų skaitikliai -> nconflicts O(1)
+    try:
+        if backjumping:
+            results = iter([backjump(start)[0]])
+        elif engine == "recursive":
+            results = iter([backtrack(start)])
+        else:
+            results = backtrack_iterative(start)
+        for result in results:
+            if result is None:
+                return
+            if not is_goal(result):
+                raise AssertionError("Solver returned an invalid assignment.")
+            yield csp.decode(result)
+    finally:
+        csp.track_conflicts(None)
+        csp.var_order = None
+
+
+#########################################################################################################[#2]
+def backtracking_search(
+    csp: CSP,
+    select_unassigned_variable= mrv,
+    order_domain_values     = lcv,
+    inference               = forward_checking,
+    trace: Optional[List[Dict[str, Any]]] = None,   # Jei paduosi [], kaups žingsnius vizualizacijai
+    max_steps: Optional[int] = None,                # Apsauga, kad trace neišsipūstų
+    undo: str = "removals",                         # "removals" (sąrašas mazgui) arba "trail" (vienas Trail)
+    engine: str = "recursive",                      # "recursive" arba "iterative" (aiškus stekas, be rekursijos)
+    backjumping: bool = False,                      # True -> conflict-directed backjumping (CBJ), papildomas BACKJUMP įvykis
+    nogoods: Optional[NogoodStore] = None,          # išmoktų nogood'ų saugykla (tik su backjumping=True)
+    symmetry_breaking: bool = False,                # spalvos sukeičiamos -> leidžiam tik indeksą <= max panaudotas + 1
+    restarts: Optional[RestartPolicy] = None,       # mazgų ribos (Luby / geometric), seed'intas rng, statistika
+    log_events: Optional[Iterable[str]] = None,     # kuriuos įvykius rašyti į trace (None -> visus)
+    trace_mode: str = "full",                       # "full" (su assignment kopija) arba "delta" (be jos)
+) -> Optional[Dict[str, Any]]:
+    """
+    Backtracking (DFS) mapos spalvinimui.
+    trace įrašai: TRY, CONFLICT, ASSIGN, INFER_FAIL, BACKTRACK, GOAL (+ BACKJUMP, kai backjumping=True)
+    undo="trail": visi pašalinimai rašomi į vieną Trail, atšaukimas = nukirpimas iki lygio žymės.
+    engine="iterative": tas pats DFS su aiškiu steku (nėra sys.getrecursionlimit() ribos),
+    trace ir rezultatas tokie patys kaip rekursinio varianto.
+    backjumping=True: kiekvienam regionui kaupiama konfliktų aibė (kas išmetė jo spalvas per
+    forward checking, su kuo konfliktavo), o aklavietėje grįžtama iškart į giliausią kaltininką;
+    praleisti lygiai pažymimi BACKJUMP įvykiu.
+    nogoods: nesėkmingo pomedžio konfliktų aibės priskyrimas įrašomas į NogoodStore ir
+    tikrinamas prieš kiekvieną priskyrimą (atmesta spalva -> CONFLICT įvykis).
+    symmetry_breaking=True: regionas gali gauti spalvą, kurios indeksas ne didesnis nei
+    didžiausias jau panaudotas + 1, todėl neieškoma visų k! spalvų perstatų
+    (tik different_values CSP su vienodais dabartiniais domenais, csp.choices; kitaip ValueError).
+    restarts: paieška nutraukiama pasiekus restarts.node_limit(run) priskyrimų ir paleidžiama iš naujo
+    (trace įvykis RESTART); domenai atstatomi, o nogoods išlieka.
+    Lygybės laužomos restarts.rng; kiekvieno paleidimo statistika — restarts.stats.
+    log_events filtruoja įvykius dar paieškoje (step numeracija lieka kaip pilno trace, max_steps skaičiuoja visus).
+    trace_mode="delta": įrašai be assignment snapshot'o, juos atkuria replay_trace.
+    trace=collections.deque(maxlen=N): ring buffer, laikomi tik paskutiniai N įvykių.
+    trace=JsonlTraceSink(path) / CsvTraceSink(path): įvykiai rašomi į failą partijomis paieškos metu.
+    """
+    tracer = None if trace is None else TraceLog(trace, max_steps, log_events, trace_mode)
+
+    def run_once() -> Optional[Dict[str, Any]]:
+        search = _search(csp, select_unassigned_variable, order_domain_values, inference, tracer,
+                         undo, engine, backjumping, nogoods, symmetry_breaking, restarts)
+        try:
+            return next(search, None)
+        finally:
+            search.close()
+
+    if restarts is None:
+        return run_once()
+
+    saved_rng, csp.rng = csp.rng, restarts.rng
+    saved_domains = copy.deepcopy(csp.curr_domains)
+    try:
+        run = len(restarts.stats)
+        while True:
+            restarts.limit, restarts.nodes = restarts.node_limit(run), 0
+            try:
+                result = run_once()
+            except RestartLimit:
+                restarts.stats.append({"run": run, "limit": restarts.limit, "nodes": restarts.nodes - 1, "outcome": "limit"})
+                csp.curr_domains = copy.deepcopy(saved_domains)
+                if tracer is not None:
+                    tracer(csp, "RESTART", csp.new_assignment())
+                run += 1
+                continue
+            outcome = "unsat" if result is None else "solved"
+            restarts.stats.append({"run": run, "limit": restarts.limit, "nodes": restarts.nodes, "outcome": outcome})
+            return result
+    finally:
+        csp.rng = saved_rng
+
+
+def iter_solutions(
+    csp: CSP,
+    limit: Optional[int] = None,
+    select_unassigned_variable= mrv,
+    order_domain_values     = lcv,
+    inference               = forward_checking,
+    trace: Optional[List[Dict[str, Any]]] = None,
+    max_steps: Optional[int] = None,
+    undo: str = "removals",
+    symmetry_breaking: bool = False,
+    log_events: Optional[Iterable[str]] = None,
+    trace_mode: str = "full",
+):
+    """
+    Generatorius: sprendiniai po vieną, tingiai (tas pats iteratyvus variklis kaip backtracking_search).
+    limit — kiek daugiausia sprendinių grąžinti. symmetry_breaking=True -> tik kanoniniai sprendiniai
+    (po vieną iš kiekvienos spalvų perstatų klasės; visus duoda expand_color_permutations).
+    Nutraukus iteraciją, csp domenai ir skaitikliai atstatomi. log_events, trace_mode — kaip backtracking_search.
+    """
+    if undo not in ("removals", "trail"):
+        raise ValueError(f"Unknown undo mode: {undo!r}")
+    tracer = None if trace is None else TraceLog(trace, max_steps, log_events, trace_mode)
+    search = _search(csp, select_unassigned_variable, order_domain_values, inference, tracer,
+                     undo, "iterative", False, None, symmetry_breaking)
+    try:
+        yield from islice(search, limit)
+    finally:
+        search.close()
+
+
+def count_solutions(csp: CSP) -> int:
+    """
+    Sprendinių skaičius be jų išvardijimo.
+    Priskyrus regioną kaimynų domenai apkarpomi (forward checking), likę regionai skaidomi
+    į jungiąsias komponentes, o komponentės sprendinių skaičiai dauginami.
+    Memo raktas = (komponentės regionai, jų likę domenai) — tas pats použdavinys skaičiuojamas vieną kartą.
+    """
+    order = {v: i for i, v in enumerate(csp.variables)}
+    rank = {v: -i for i, v in enumerate(min_fill_order(csp.neighbors, csp.variables))}
+    memo: Dict[Tuple[Any, ...], int] = {}
+
+    def components(variables: List[Any]) -> List[List[Any]]:
+        return [sorted(part, key=order.__getitem__) for part in connected_components(csp.neighbors, variables)]
+
+    def count(part: List[Any], domains: Dict[Any, Tuple[Any, ...]]) -> int:
+        if len(part) == 1:
+            return len(domains[part[0]])
+        key = (tuple(part), tuple(domains[v] for v in part))
+        if key in memo:
+            return memo[key]
+        inside = set(part)
+        # vienetiniai domenai pirmiau, paskui vėliausiai eliminuojami (separatoriai) -> komponentės skyla anksčiau
+        var = min(part, key=lambda v: (len(domains[v]) > 1, rank[v]))
+        rest = [v for v in part if v != var]
+        total = 0
+        for value in domains[var]:
+            pruned = dict(domains)
+            for n in csp.neighbors[var]:
+                if n in inside and n != var:
+                    pruned[n] = tuple(x for x in domains[n] if csp.constraints(var, value, n, x))
+                    if not pruned[n]:
+                        break
+            else:
+                product = 1
+                for sub in components(rest):
+                    product *= count(sub, pruned)
+                    if not product:
+                        break
+                total += product
+        memo[key] = total
+        return total
+
+    domains = {v: tuple(csp.choices(v)) for v in csp.variables}
+    result = 1
+    for part in components(list(csp.variables)):
+        result *= count(part, domains)
+        if not result:
+            break
+    return result
+
+
+# -----------------------------
+# Local search (min-conflicts)
+# -----------------------------
+
+def min_conflicts(
+    csp: CSP,
+    max_steps: int = 100_000,
+    seed: Optional[int] = None,
+    tabu_tenure: int = 0,                           # kiek žingsnių ką tik pakeistas regionas "užšaldomas"
+    walk_prob: float = 0.0,                         # tikimybė vietoj geriausios spalvos imti atsitiktinę
+    trace: Optional[List[Dict[str, Any]]] = None,   # tie patys įrašai kaip backtracking_search (ASSIGN, GOAL)
+) -> Tuple[Dict[str, Any], int]:
+    """
+    Min-conflicts lokali paieška dideliems grafams.
+    Konfliktuojančių regionų aibė atnaujinama po kiekvieno ėjimo (tik pakeistas regionas ir jo kaimynai).
+    Grąžina (geriausias rastas priskyrimas, jo konfliktų skaičius); 0 -> sprendinys.
+    """
+    rng = random.Random(seed)
+    current = csp.new_assignment()
+    csp.track_conflicts(current)
+    step = 0
+
+    def log(event: str, var: Any = None, val: Any = None) -> None:
+        nonlocal step
+        step += 1
+        if trace is not None:
+            trace.append(trace_event(csp, step, event, current, var, val))
+
+    def best_value(var: Any) -> Any:
+        return argmin_random_tie(csp.domains[var], key=lambda val: csp.nconflicts(var, val, current), rng=rng)
+
+    try:
+        # Pradinis godus priskyrimas
+        for var in csp.variables:
+            val = best_value(var)
+            csp.assign(var, val, current)
+            log("ASSIGN", var, val)
+
+        # Konfliktuojantys regionai: sąrašas + pozicijos (O(1) įdėjimas, išėmimas, atsitiktinis pasirinkimas)
+        conflicted: List[Any] = []
+        pos: Dict[Any, int] = {}
+
+        def refresh(var: Any) -> None:
+            bad = csp.nconflicts(var, current[var], current) > 0
+            if bad and var not in pos:
+                pos[var] = len(conflicted)
+                conflicted.append(var)
+            elif not bad and var in pos:
+                i = pos.pop(var)
+                last = conflicted.pop()
+                if last != var:
+                    conflicted[i] = last
+                    pos[last] = i
+
+        total = 0
+        for var in csp.variables:
+            refresh(var)
+            total += csp.nconflicts(var, current[var], current)
+        total //= 2  # kiekviena briauna suskaičiuota du kartus
+
+        best, best_total = current.copy(), total
+        tabu_until: Dict[Any, int] = {}
+
+        for i in range(max_steps):
+            if not conflicted:
+                break
+            candidates = [v for v in conflicted if tabu_until.get(v, -1) < i] if tabu_tenure else conflicted
+            var = rng.choice(candidates or conflicted)
+            old = current[var]
+            if walk_prob and rng.random() < walk_prob:
+                val = rng.choice(csp.domains[var])
+            else:
+                val = best_value(var)
+            if val == old:
+                continue
+
+            total += csp.nconflicts(var, val, current) - csp.nconflicts(var, old, current)
+            csp.assign(var, val, current)
+            log("ASSIGN", var, val)
+            if tabu_tenure:
+                tabu_until[var] = i + tabu_tenure
+            refresh(var)
+            for n in csp.neighbors[var]:
+                refresh(n)
+
+            if total < best_total:
+                best, best_total = current.copy(), total
+
+        if best_total == 0:
+            log("GOAL")
+        return csp.decode(best), best_total
+    finally:
+        csp.track_conflicts(None)
+
+
+# -----------------------------
+# Decomposition (components / blocks)
+# -----------------------------
+
+def connected_components(neighbors: Dict[str, List[str]], variables: Optional[Iterable[str]] = None) -> List[List[str]]:
+    """Grafo jungiosios komponentės (BFS), pvz. salos — atskiri uždaviniai. variables -> tik tų regionų pografis."""
+    variables = list(neighbors if variables is None else variables)
+    keep = set(variables)
+    seen: set = set()
+    components = []
+    for root in variables:
+        if root in seen:
+            continue
+        seen.add(root)
+        component = [root]
+        queue = deque([root])
+        while queue:
+            v = queue.popleft()
+            for n in neighbors[v]:
+                if n in keep and n not in seen:
+                    seen.add(n)
+                    component.append(n)
+                    queue.append(n)
+        components.append(component)
+    return components
+
+
+def min_fill_order(
+    neighbors: Dict[str, List[str]],
+    variables: Optional[Iterable[str]] = None,
+    degrees: Optional[List[int]] = None,
+) -> List[str]:
+    """
+    Eliminavimo tvarka (min-fill): kaskart šalinam regioną, kurio kaimynus sujungti reikia mažiausiai
+    naujų briaunų (lygybėje — mažiausias laipsnis). Pabaigoje lieka "centriniai" regionai (separatoriai).
+    variables -> tik tų regionų pografis.
+    degrees (pvz. []) — kiekvieno regiono kaimynų skaičius jo eliminavimo metu (ta pačia tvarka).
+    """
+    variables = list(neighbors if variables is None else variables)
+    keep = set(variables)
+    adj = {v: keep.intersection(neighbors[v]) for v in variables}
+
+    def fill(v: str) -> int:
+        around = list(adj[v])
+        return sum(1 for i, a in enumerate(around) for b in around[i + 1:] if b not in adj[a])
+
+    order = []
+    while adj:
+        v = min(adj, key=lambda v: (fill(v), len(adj[v])))
+        around = adj.pop(v)
+        for a in around:
+            adj[a] |= around
+            adj[a] -= {a, v}
+        order.append(v)
+        if degrees is not None:
+            degrees.append(len(around))
+    return order
+
+
+def treewidth_estimate(neighbors: Dict[str, List[str]], variables: Optional[Iterable[str]] = None) -> int:
+    """Medžio pločio įvertis: didžiausias kaimynų skaičius eliminuojant min_fill_order tvarka (viršutinė riba)."""
+    degrees: List[int] = []
+    min_fill_order(neighbors, variables, degrees)
+    return max(degrees, default=0)
+
+
+def cycle_cutset(neighbors: Dict[str, List[str]], variables: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Godus ciklų pjūvis: nuimam regionus su <= 1 kaimynu (medžio dalys), tada į pjūvį dedam
+    didžiausio laipsnio regioną ir kartojam. Be pjūvio regionų likęs grafas — miškas.
+    variables -> tik tų regionų pografis.
+    """
+    variables = list(neighbors if variables is None else variables)
+    keep = set(variables)
+    adj = {v: keep.intersection(neighbors[v]) for v in variables}
+    cutset: List[str] = []
+
+    def remove(v: str) -> None:
+        for n in adj.pop(v):
+            adj[n].discard(v)
+
+    while adj:
+        leaves = [v for v in adj if len(adj[v]) <= 1]
+        while leaves:
+            v = leaves.pop()
+            if v not in adj:
+                continue
+            around = adj[v]
+            remove(v)
+            leaves.extend(n for n in around if len(adj[n]) <= 1)
+        if adj:
+            v = max(adj, key=lambda v: len(adj[v]))
+            cutset.append(v)
+            remove(v)
+    return cutset
+
+
+def biconnected_components(
+    neighbors: Dict[str, List[str]], variables: Optional[Iterable[str]] = None
+) -> Tuple[List[List[str]], set]:
+    """
+    Dvigubai jungūs blokai ir sąlyčio taškai (articulation points), Tarjan be rekursijos.
+    Kiekviena briauna priklauso lygiai vienam blokui; izoliuotas regionas — atskiras blokas.
+    variables -> tik tų regionų pografis.
+    """
+    variables = list(neighbors if variables is None else variables)
+    keep = set(variables)
+    index: Dict[str, int] = {}
+    low: Dict[str, int] = {}
+    blocks: List[List[str]] = []
+    articulation: set = set()
+
+    def around(v: str):
+        return (n for n in neighbors[v] if n in keep)
+
+    for root in variables:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        if not any(n in keep for n in neighbors[root]):
+            blocks.append([root])
+            continue
+        root_children = 0
+        stack = [(root, None, around(root))]
+        edges: List[Tuple[str, str]] = []
+        while stack:
+            v, parent, it = stack[-1]
+            for w in it:
+                if w == parent:
+                    continue
+                if w not in index:
+                    index[w] = low[w] = len(index)
+                    edges.append((v, w))
+                    stack.append((w, v, around(w)))
+                    break
+                if index[w] < index[v]:
+                    edges.append((v, w))
+                    low[v] = min(low[v], index[w])
+            else:
+                stack.pop()
+                if not stack:
+                    continue
+                u = stack[-1][0]
+                low[u] = min(low[u], low[v])
+                if low[v] >= index[u]:
+                    # u atskiria v pomedį -> nuimam bloką nuo briaunų steko
+                    block: Dict[str, None] = {}
+                    while True:
+                        e = edges.pop()
+                        block.update(dict.fromkeys(e))
+                        if e == (u, v):
+                            break
+                    blocks.append(list(block))
+                    if u == root:
+                        root_children += 1
+                    else:
+                        articulation.add(u)
+        if root_children > 1:
+            articulation.add(root)
+    return blocks, articulation
+
+
+def _solve_subproblem(args: Tuple[CSP, Callable, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    sub, solver, kwargs = args
+    return solver(sub, **kwargs)
+
+
+def solve_by_components(
+    csp: CSP,
+    solver: Callable = None,
+    blocks: bool = False,           # True -> skaidom ir į dvigubai jungius blokus (tik sukeičiamoms spalvoms)
+    workers: Optional[int] = None,  # >1 -> dalys sprendžiamos lygiagrečiai ProcessPoolExecutor'iuje
+    **solver_kwargs,
+) -> Optional[Dict[str, Any]]:
+    """
+    Sprendžiam kiekvieną kaimynystės grafo dalį atskirai ir sujungiam rezultatus.
+    Komponentės nepriklausomos, todėl vienos salos aklavietė nebeverčia grįžti per kitas.
+    blocks=True: blokai sprendžiami atskirai, o sujungiant bloko spalvos sukeičiamos taip,
+    kad sąlyčio taškas sutaptų su jau nuspalvintu (spalvos sukeičiamos -> sprendinys lieka teisingas);
+    reikia vienodų dabartinių domenų (color_palette), kitaip ValueError.
+    Sujungtas sprendinys patikrinamas (pilnas, be konfliktų, reikšmės iš csp.choices).
+    solver_kwargs perduodami solveriui (numatytasis — backtracking_search).
+    """
+    if solver is None:
+        solver = backtracking_search
+    name = csp.name
+
+    if blocks:
+        color_palette(csp)  # patikrina, ar spalvos sukeičiamos (pagal dabartinius domenus — juos naudoja subproblem)
+        parts, articulation = biconnected_components(csp.neighbors, csp.variables)
+    else:
+        parts, articulation = connected_components(csp.neighbors, csp.variables), set()
+
+    jobs = [(csp.subproblem(part), solver, solver_kwargs) for part in parts]
+    if workers is not None and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            solutions = list(pool.map(_solve_subproblem, jobs))
+    else:
+        solutions = []
+        for job in jobs:
+            solutions.append(_solve_subproblem(job))
+            if solutions[-1] is None:
+                break
+    if any(sol is None for sol in solutions) or len(solutions) < len(parts):
+        return None
+    if not blocks:
+        return _checked(csp, {v: c for sol in solutions for v, c in sol.items()})
+
+    # Blokų sujungimas: einam per blokų-sąlyčio taškų medį (BFS)
+    part_of: Dict[str, List[int]] = defaultdict(list)
+    for i, part in enumerate(parts):
+        for a in part:
+            if a in articulation:
+                part_of[name(a)].append(i)
+    result: Dict[str, Any] = {}
+    done: set = set()
+    for start in range(len(parts)):
+        if start in done:
+            continue
+        done.add(start)
+        result.update(solutions[start])
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            for a in parts[i]:
+                for j in part_of.get(name(a), ()):
+                    if j in done:
+                        continue
+                    sol = solutions[j]
+                    mine, wanted = sol[name(a)], result[name(a)]
+                    swap = {mine: wanted, wanted: mine}
+                    result.update({v: swap.get(c, c) for v, c in sol.items()})
+                    done.add(j)
+                    queue.append(j)
+    return _checked(csp, result)
+
+
+def _checked(csp: CSP, solution: Dict[str, Any]) -> Dict[str, Any]:
+    """Sujungtas sprendinys turi būti pilnas, iš dabartinių domenų ir be konfliktų."""
+    assignment = csp.encode(solution)
+    if len(assignment) != len(csp.variables) or any(
+        assignment[v] not in csp.choices(v)
+        or any(not csp.constraints(v, assignment[v], n, assignment[n]) for n in csp.neighbors[v])
+        for v in csp.variables
+    ):
         raise AssertionError("Solver returned an invalid assignment.")
+    return solution
+
+
+def peel_low_degree(csp: CSP) -> Tuple[List[Any], List[Any]]:
+    """
+    Nuimam regionus, kurių (likęs) kaimynų skaičius mažesnis už jų domeno dydį —
+    juos visada galima nuspalvinti paskutinius. Kartojam, kol tokių nelieka.
+    Grąžina (branduolys, nuimti regionai nuėmimo tvarka).
+    """
+    degree = {v: len(csp.neighbors[v]) for v in csp.variables}
+    size = {v: len(csp.choices(v)) for v in csp.variables}
+    queue = deque(v for v in csp.variables if degree[v] < size[v])
+    peeled: List[Any] = []
+    removed: set = set()
+    while queue:
+        v = queue.popleft()
+        if v in removed:
+            continue
+        removed.add(v)
+        peeled.append(v)
+        for n in csp.neighbors[v]:
+            if n not in removed:
+                degree[n] -= 1
+                if degree[n] == size[n] - 1:
+                    queue.append(n)
+    core = [v for v in csp.variables if v not in removed]
+    return core, peeled
+
+
+def solve_with_reduction(csp: CSP, solver: Callable = None, **solver_kwargs) -> Optional[Dict[str, Any]]:
+    """
+    k-spalvinimas su redukcija: peel_low_degree -> branduolį sprendžia solver
+    (numatytasis backtracking_search) -> nuimtus regionus godžiai spalvinam atvirkštine tvarka
+    (kiekvienas tada turi mažiau nuspalvintų kaimynų nei spalvų, todėl spalva visada randama).
+    """
+    if not csp.different_values:
+        raise ValueError("degree reduction needs a different-values CSP")
+    if solver is None:
+        solver = backtracking_search
+    name, color = csp.name, csp.value
+
+    core, peeled = peel_low_degree(csp)
+    result: Dict[str, Any] = {}
+    if core:
+        solution = solver(csp.subproblem(core), **solver_kwargs)
+        if solution is None:
+            return None
+        result.update(solution)
+
+    for v in reversed(peeled):
+        used = {result[name(n)] for n in csp.neighbors[v] if name(n) in result}
+        result[name(v)] = next(color(c) for c in csp.choices(v) if color(c) not in used)
     return result
 
 
+def resolve(
+    csp: CSP,
+    previous_solution: Dict[str, Any],
+    added_edges: Iterable[Tuple[str, str]] = (),
+    removed_edges: Iterable[Tuple[str, str]] = (),
+    added_vars: Iterable[str] = (),
+    max_radius: int = 3,
+    **solver_kwargs,
+) -> Optional[Dict[str, Any]]:
+    """
+    Pakartotinis sprendimas po grafo pakeitimų (csp.edit_graph) be paieškos nuo nulio.
+    Ankstesnis nuspalvinimas paliekamas; atlaisvinami tik nauji / konfliktuojantys regionai
+    ir jų kaimynai iki max_radius žingsnių (spindulys didinamas po vieną).
+    Atlaisvinta dalis sprendžiama kaip použdavinys, kur fiksuotų kaimynų spalvos išmestos iš domenų.
+    Jei taisymas nepavyksta — pilnas backtracking_search visam CSP.
+    Numatytoji spalvų tvarka — pirmiau ankstesnė regiono spalva.
+    CompiledCSP nepalaikomas (TypeError): redaguojamas šaltinio CSP, o kompiliuojama po resolve.
+    """
+    if isinstance(csp, CompiledCSP):
+        raise TypeError("resolve needs a named CSP: edit the source CSP instead of a CompiledCSP")
+    added_edges, added_vars = list(added_edges), list(added_vars)
+    csp.edit_graph(added_edges, removed_edges, added_vars)
+    base = {v: c for v, c in previous_solution.items() if v in csp.neighbors and c in csp.domains[v]}
+    touched = set(added_vars) | {v for edge in added_edges for v in edge}
+    free = {v for v in csp.variables if v not in base}
+    free |= {v for v in touched if v in base and csp.nconflicts(v, base[v], base)}
+    if not free:
+        return base  # pašalintos briaunos konfliktų nesukuria
+
+    def keep_previous(var: Any, assignment: Dict[str, Any], sub: CSP) -> List[Any]:
+        """Pirmiau bandoma ankstesnė spalva (kuo mažiau perspalvintų regionų)."""
+        return sorted(sub.choices(var), key=lambda c: c != base.get(var))
+
+    solver_kwargs.setdefault("order_domain_values", keep_previous)
+
+    for radius in range(max_radius + 1):
+        if radius:
+            free |= {n for v in free for n in csp.neighbors[v]}
+        fixed = {v: c for v, c in base.items() if v not in free}
+        csp.support_pruning()
+        removals: List[Tuple[str, Any]] = []
+        for v in free:
+            for n in csp.neighbors[v]:
+                if n in fixed:
+                    for c in list(csp.choices(v)):
+                        if not csp.constraints(v, c, n, fixed[n]):
+                            csp.prune(v, c, removals)
+        sub = csp.subproblem([v for v in csp.variables if v in free])
+        csp.restore(removals)
+        csp.curr_domains = None
+        solution = backtracking_search(sub, **solver_kwargs)
+        if solution is not None:
+            fixed.update(solution)
+            return fixed
+    return backtracking_search(csp, **solver_kwargs)
+
+
+def _solve_forest(csp: CSP, variables: List[Any], domains: Dict[Any, Tuple[Any, ...]]) -> Optional[Dict[Any, Any]]:
+    """
+    Miško CSP tiesiniu laiku: BFS tvarka nuo šaknų, kryptinis lankų suderinamumas (DAC) nuo lapų
+    į šaknį, tada priskyrimas nuo šaknies — kiekvienam vaikui visada lieka suderinama spalva.
+    """
+    inside = set(variables)
+    parent: Dict[Any, Any] = {}
+    order: List[Any] = []
+    for root in variables:
+        if root in parent:
+            continue
+        parent[root] = None
+        queue = deque([root])
+        while queue:
+            v = queue.popleft()
+            order.append(v)
+            for n in csp.neighbors[v]:
+                if n in inside and n not in parent:
+                    parent[n] = v
+                    queue.append(n)
+
+    dom = {v: list(domains[v]) for v in variables}
+    if not all(dom.values()):
+        return None
+    for v in reversed(order):
+        p = parent[v]
+        if p is None:
+            continue
+        dom[p] = [x for x in dom[p] if any(csp.constraints(p, x, v, y) for y in dom[v])]
+        if not dom[p]:
+            return None
+
+    result: Dict[Any, Any] = {}
+    for v in order:
+        p = parent[v]
+        result[v] = dom[v][0] if p is None else next(y for y in dom[v] if csp.constraints(p, result[p], v, y))
+    return result
+
+
+def _decoded(csp: CSP, values: Dict[Any, Any]) -> Dict[str, Any]:
+    assignment = csp.new_assignment()
+    for v, c in values.items():
+        assignment[v] = c
+    return csp.decode(assignment)
+
+
+def _is_forest(neighbors: Dict[Any, List[Any]], variables: List[Any]) -> bool:
+    """Ar variables pografis be ciklų: kiekvienoje komponentėje briaunų = regionų - 1."""
+    keep = set(variables)
+    return all(
+        sum(1 for v in part for n in neighbors[v] if n in keep) == 2 * (len(part) - 1)
+        for part in connected_components(neighbors, variables)
+    )
+
+
+def tree_csp_solver(csp: CSP) -> Optional[Dict[str, Any]]:
+    """Medžio (miško) formos CSP be paieškos; ciklų turintis grafas -> ValueError."""
+    if not _is_forest(csp.neighbors, csp.variables):
+        raise ValueError("constraint graph has a cycle (use cutset_conditioning)")
+    solution = _solve_forest(csp, list(csp.variables), {v: tuple(csp.choices(v)) for v in csp.variables})
+    return None if solution is None else _decoded(csp, solution)
+
+
+def cutset_conditioning(csp: CSP, cutset: Optional[List[Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Ciklų pjūvio sąlygojimas: pjūvio regionams perrenkami suderinami priskyrimai (su forward checking
+    visiems kaimynams), o kiekvienam likęs miškas sprendžiamas _solve_forest.
+    Simetrijos laužymas pjūviui taikomas tik kai visi dabartiniai domenai (csp.choices) sutampa su palete,
+    nes būtent iš jų renkamos reikšmės.
+    Laikas ~ d^|pjūvis| * n, todėl tinka tik mažam pjūviui.
+    Paduotas cutset, po kurio pašalinimo lieka ciklų (ne ciklų pjūvis) -> ValueError.
+    """
+    if cutset is None:
+        cutset = cycle_cutset(csp.neighbors, csp.variables)
+    in_cut = set(cutset)
+    forest = [v for v in csp.variables if v not in in_cut]
+    if not _is_forest(csp.neighbors, forest):
+        raise ValueError("cutset leaves a cycle in the constraint graph")
+    start = {v: tuple(csp.choices(v)) for v in csp.variables}
+    try:
+        color_pos = {c: i for i, c in enumerate(color_palette(csp))}  # tikrina tuos pačius csp.choices
+    except ValueError:
+        color_pos = None
+    assignment: Dict[Any, Any] = {}
+
+    def extend(i: int, domains: Dict[Any, Tuple[Any, ...]]) -> Optional[Dict[Any, Any]]:
+        if i == len(cutset):
+            rest = _solve_forest(csp, forest, domains)
+            return None if rest is None else {**rest, **assignment}
+        var = cutset[i]
+        top = max((color_pos[c] for c in assignment.values()), default=-1) if color_pos else None
+        for value in domains[var]:
+            if color_pos and color_pos[value] > top + 1:
+                continue
+            pruned = dict(domains)
+            for n in csp.neighbors[var]:
+                if n in assignment:
+                    continue
+                pruned[n] = tuple(x for x in domains[n] if csp.constraints(var, value, n, x))
+                if not pruned[n]:
+                    break
+            else:
+                assignment[var] = value
+                result = extend(i + 1, pruned)
+                del assignment[var]
+                if result is not None:
+                    return result
+        return None
+
+    solution = extend(0, start)
+    return None if solution is None else _decoded(csp, solution)
+
+
+def solve_auto(csp: CSP, max_cutset: int = 8, **solver_kwargs) -> Optional[Dict[str, Any]]:
+    """
+    Sprendiklio parinkimas pagal struktūrą: medis/miškas (treewidth_estimate <= 1) -> tree_csp_solver,
+    ciklų pjūvis ne didesnis nei max_cutset -> cutset_conditioning, kitaip backtracking_search(**solver_kwargs).
+    """
+    if treewidth_estimate(csp.neighbors, csp.variables) <= 1:
+        return tree_csp_solver(csp)
+    cutset = cycle_cutset(csp.neighbors, csp.variables)
+    if len(cutset) <= max_cutset:
+        return cutset_conditioning(csp, cutset)
+    return backtracking_search(csp, **solver_kwargs)
+
+
+# -----------------------------
+# Portfolio (parallel configurations)
+# -----------------------------
+
+def _portfolio_worker(index: int, csp: CSP, config: Dict[str, Any], results: Any) -> None:
+    """Vienas portfelio procesas: sprendžia su savo konfigūracija ir seed'u, rezultatą deda į eilę."""
+    kwargs = dict(config)
+    seed = kwargs.pop("seed", index)
+    csp.rng = random.Random(seed)
+    if kwargs.get("restarts") is not None:
+        # su restarts lygybes laužo restarts.rng -> politikos kopija gauna šio proceso seed'ą
+        kwargs["restarts"] = copy.copy(kwargs["restarts"])
+        kwargs["restarts"].rng = random.Random(seed)
+        kwargs["restarts"].stats = []
+    stats: Dict[str, Any] = {"worker": index, "seed": seed}
+    started = time.perf_counter()
+    try:
+        solution = backtracking_search(csp, **kwargs)
+    except Exception as e:  # klaida (pvz. max_steps) — šis procesas tiesiog nelaimi
+        stats.update(error=repr(e), seconds=time.perf_counter() - started)
+        results.put((index, stats, None))
+        return
+    stats.update(seconds=time.perf_counter() - started, nassigns=csp.nassigns, nrevisions=csp.nrevisions)
+    results.put((index, stats, solution))
+
+
+def portfolio_solve(
+    csp: CSP,
+    configs: List[Dict[str, Any]],
+    workers: Optional[int] = None,
+) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    Kelios backtracking_search konfigūracijos lygiagrečiai, atskiruose procesuose.
+    configs: backtracking_search kwargs žodynai (+ "seed"; numatytasis — konfigūracijos indeksas).
+    seed naudojamas ir restarts politikos rng (procesas gauna politikos kopiją), todėl vienoda
+    RestartPolicy skirtingose konfigūracijose su skirtingais seed'ais ieško skirtingai.
+    Pirmas užbaigęs (sprendinys arba įrodyta, kad jo nėra) laimi, kiti procesai nutraukiami (terminate).
+    workers — kiek procesų vienu metu (numatytasis min(len(configs), os.cpu_count())).
+    Grąžina (laiminti konfigūracija, jos statistika, sprendinys).
+    ProcessPoolExecutor čia netinka: jau vykdomos užduoties jis atšaukti negali.
+    """
+    if not configs:
+        raise ValueError("portfolio needs at least one config")
+    if workers is None:
+        workers = min(len(configs), os.cpu_count() or 1)
+    results = multiprocessing.Queue()
+    pending = list(enumerate(configs))
+    running: Dict[int, Any] = {}
+    errors: List[Dict[str, Any]] = []
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                index, config = pending.pop(0)
+                proc = multiprocessing.Process(target=_portfolio_worker, args=(index, csp, config, results), daemon=True)
+                proc.start()
+                running[index] = proc
+            try:
+                index, stats, solution = results.get(timeout=0.1)
+            except queue_module.Empty:
+                # procesas žuvo nieko neįdėjęs į eilę -> laikom klaida
+                for index, proc in list(running.items()):
+                    if proc.exitcode not in (None, 0):
+                        errors.append({"worker": index, "error": f"exit code {proc.exitcode}"})
+                        del running[index]
+                continue
+            running.pop(index).join()
+            if "error" in stats:
+                errors.append(stats)
+                continue
+            return configs[index], stats, solution
+    finally:
+        for proc in running.values():
+            proc.terminate()
+        for proc in running.values():
+            proc.join()
+    raise RuntimeError(f"all portfolio configs failed: {errors}")
+
+
 # -----------------------------
 # Map Coloring helpers (essential)
 # -----------------------------
@@ -417,15 +2509,122 @@ def parse_neighbors(neighbors: str) -> Dict[str, List[str]]:
     return {k: sorted(set(v)) for k, v in graph.items()}
 
 
-def MapColoringCSP(colors: List[Any], neighbors: Dict[str, List[str]] | str) -> CSP:
+def MapColoringCSP(colors: List[Any], neighbors: Dict[str, List[str]] | str, bitset: bool = False) -> CSP:
     """
     Sukuria CSP žemėlapio spalvinimui.
     colors: pvz ['R','G','B']
     neighbors: dict arba tekstas (parse_neighbors formatas)
+    bitset: True -> domenai laikomi bitų kaukėmis (BitsetCSP)
     """
     if isinstance(neighbors, str):
         neighbors = parse_neighbors(neighbors)
 
     variables = list(neighbors.keys())
     domains = {v: list(colors) for v in variables}
-    return CSP(variables, domains, neighbors, different_values_constraint)
+    cls = BitsetCSP if bitset else CSP
+    return cls(variables, domains, neighbors, different_values_constraint)
+
+
+def dsatur_coloring(neighbors: Dict[str, List[str]]) -> Dict[str, int]:
+    """
+    Greitas godus DSatur nuspalvinimas be backtracking'o.
+    Grąžina {regionas: spalvos numeris 0..}; max + 1 = viršutinė spalvų skaičiaus riba.
+    """
+    order = {v: i for i, v in enumerate(neighbors)}
+    sat: Dict[str, set] = {v: set() for v in neighbors}
+    uncolored = {v: len(neighbors[v]) for v in neighbors}
+    heap = [(0, -uncolored[v], order[v], v) for v in neighbors]
+    heapq.heapify(heap)
+    coloring: Dict[str, int] = {}
+
+    while heap:
+        neg_sat, neg_deg, _, v = heapq.heappop(heap)
+        if v in coloring or (-neg_sat, -neg_deg) != (len(sat[v]), uncolored[v]):
+            continue  # pasenęs įrašas
+        color = 0
+        while color in sat[v]:
+            color += 1
+        coloring[v] = color
+        for n in neighbors[v]:
+            if n in coloring:
+                continue
+            sat[n].add(color)
+            uncolored[n] -= 1
+            heapq.heappush(heap, (-len(sat[n]), -uncolored[n], order[n], n))
+    return coloring
+
+
+def greedy_clique(neighbors: Dict[str, List[str]]) -> List[str]:
+    """
+    Godi klika (apatinė spalvų skaičiaus riba): iš kiekvieno regiono plečiam kliką kandidatu,
+    turinčiu daugiausia kaimynų tarp likusių kandidatų. Grąžina didžiausią rastą.
+    """
+    adj = {v: set(neighbors[v]) for v in neighbors}
+    best: List[str] = []
+    for v in sorted(adj, key=lambda v: -len(adj[v])):
+        if len(adj[v]) < len(best):
+            break  # mažesnio laipsnio regionas didesnės klikos nesudarys
+        clique, candidates = [v], list(neighbors[v])
+        while candidates:
+            u = max(candidates, key=lambda u: sum(w in adj[u] for w in candidates))
+            clique.append(u)
+            candidates = [w for w in candidates if w in adj[u]]
+        if len(clique) > len(best):
+            best = clique
+    return best
+
+
+def chromatic_number(
+    neighbors: Dict[str, List[str]],
+    on_bounds: Optional[Callable[[int, int], None]] = None,
+    **solver_kwargs,
+) -> Tuple[int, Dict[str, int]]:
+    """
+    Mažiausias spalvų skaičius. Viršutinė riba — dsatur_coloring, apatinė — greedy_clique.
+    k mažinamas po vieną tame pačiame CSP (domenai tik siaurinami, todėl NogoodStore lieka galioti):
+    pirma bandom ankstesnį sprendinį pataisyti godžiai (perspalvinti spalvos k regionus),
+    jei nepavyksta — backtracking_search su CBJ. Klikos regionams spalvos fiksuotos (0, 1, ...).
+    on_bounds(apatinė, viršutinė) kviečiamas pradžioje ir kaskart pasikeitus ribai.
+    solver_kwargs perduodami backtracking_search (nogoods= — sava NogoodStore; backjumping=False -> ValueError).
+    Grąžina (spalvų skaičius, {regionas: spalvos numeris}).
+    """
+    best = dsatur_coloring(neighbors)
+    upper = max(best.values(), default=-1) + 1
+    clique = greedy_clique(neighbors)
+    lower = len(clique)
+    if on_bounds is not None:
+        on_bounds(lower, upper)
+
+    problem = MapColoringCSP(list(range(upper)), neighbors, bitset=True)
+    for color, v in enumerate(clique):
+        problem.domains[v] = [color]
+    learned = solver_kwargs.pop("nogoods", None)
+    if learned is None:
+        learned = NogoodStore()
+    if not solver_kwargs.pop("backjumping", True):
+        raise ValueError("chromatic_number always uses backjumping (the NogoodStore needs it)")
+    solver_kwargs.setdefault("undo", "trail")
+
+    while lower < upper:
+        k = upper - 1
+        # 1) ankstesnio sprendinio taisymas: spalvą k keičiam laisva mažesne
+        repaired = dict(best)
+        for v, color in best.items():
+            if color == k:
+                used = {repaired[n] for n in neighbors[v]}
+                repaired[v] = next((c for c in range(k) if c not in used), k)
+        if all(c < k for c in repaired.values()):
+            solution = repaired
+        else:
+            # 2) tas pats CSP, tik be spalvos k
+            problem.curr_domains = None
+            for v in problem.variables:
+                problem.domains[v] = [c for c in problem.domains[v] if c < k]
+            solution = backtracking_search(problem, backjumping=True, nogoods=learned, **solver_kwargs)
+        if solution is None:
+            lower = upper  # k spalvų nepakanka -> įrodyta
+        else:
+            best, upper = solution, k
+        if on_bounds is not None:
+            on_bounds(lower, upper)
+    return upper, best